@@ -1,32 +1,133 @@
 # standard
+import asyncio
 import datetime
-import io
+import hashlib
+import hmac
+import logging
 import os
+import threading
 import uuid
-from typing import Optional
+from typing import BinaryIO, ContextManager, Optional
 
 # third party
 import bcrypt
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
 import uvicorn
+from cachetools import LRUCache, TTLCache, cached
 from fastapi import FastAPI, HTTPException, UploadFile, File, Response
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from linearmodels.asset_pricing import LinearFactorModel
 
 # locals
 from common.models import (
     Account,
+    Credentials,
     Portfolio,
     PortfolioHolding,
     Factor
 )
-from db import AWSDB
-from mdp import DatabaseMDP, YahooFinanceMDP
+from db import AWSDB, AWSDBPool
+from mdp import CoalescingDatabaseMDP, YahooFinanceMDP
 from s3 import AWSS3
 
-app = FastAPI(title="labfolio-api")
+app = FastAPI(title="labfolio-api", default_response_class=ORJSONResponse)
+# list and analysis payloads are repetitive JSON; small responses aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+logger = logging.getLogger("labfolio.api")
 
 DEMO_PORTFOLIO_ID = "7c2114c3-baa6-4c98-9f3c-939f414a4531"
+DB_POOL_MIN_CONNECTIONS = 5
+DB_POOL_MAX_CONNECTIONS = 20
+FACTORS_CACHE_TTL_SECONDS = 600
+RETURNS_CACHE_TTL_SECONDS = 300
+RETURNS_CACHE_MAX_ENTRIES = 128
+FACTOR_RETURNS_COALESCE_SECONDS = 0.05  # window in which concurrent factor-return fetches are merged into one query
+LOGIN_CACHE_TTL_SECONDS = 300
+LOGIN_CACHE_MAX_ENTRIES = 1024
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))  # bcrypt's default work factor; lower only for local testing
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+PORTFOLIO_ADDRESS_CACHE_SIZE = 4096
+S3_MAX_CONCURRENT_READS = 16  # S3 throughput per request stops improving beyond this many parallel GETs
+S3_MAX_POOL_CONNECTIONS = 64  # shared by every request's S3 calls, so kept well above a single request's fan-out
+
+# INSERT statements are fixed by the model fields, so build them once at import
+ACCOUNT_COLUMNS = tuple(Account.model_fields)
+# usernames are UNIQUE, so a taken username inserts nothing and returns no row instead of raising
+ACCOUNT_INSERT_QUERY = f"INSERT INTO user_management.accounts ({', '.join(ACCOUNT_COLUMNS)}) VALUES ({', '.join(['%s'] * len(ACCOUNT_COLUMNS))}) ON CONFLICT (username) DO NOTHING RETURNING user_id"
+PORTFOLIO_COLUMNS = tuple(Portfolio.model_fields)
+PORTFOLIO_INSERT_QUERY = f"""
+    WITH inserted AS (
+        INSERT INTO user_management.portfolios 
+        ({', '.join(PORTFOLIO_COLUMNS)}) 
+        VALUES ({', '.join(['%s'] * len(PORTFOLIO_COLUMNS))})
+        RETURNING portfolio_id
+    )
+    INSERT INTO user_management.user_portfolios (user_id, portfolio_id)
+    SELECT %s, portfolio_id FROM inserted
+"""
+
+# portfolio CSVs are parsed with these column types, so a non-integer quantity fails at parse time
+PORTFOLIO_CSV_CONVERT_OPTIONS = pv.ConvertOptions(column_types={'yf_ticker': pa.string(), 'quantity': pa.int64()})
+
+# hash checked against when a login names an unknown user, so the response time doesn't reveal which usernames exist
+DUMMY_PASSWORD_HASH = bcrypt.hashpw(b"labfolio-dummy-password", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+# factors are reference data that rarely change, so each worker serves /factors from memory until the TTL expires
+_factors_cache = TTLCache(maxsize=1, ttl=FACTORS_CACHE_TTL_SECONDS)
+
+# concurrent analyses mostly ask for overlapping factors over the same trailing year, so their fetches are batched
+_factor_returns_mdp = CoalescingDatabaseMDP(lambda: get_db_connection(), window_seconds=FACTOR_RETURNS_COALESCE_SECONDS)
+
+# a portfolio's S3 address is derived from its id and never changes, so lookups are kept until evicted
+_portfolio_address_cache = LRUCache(maxsize=PORTFOLIO_ADDRESS_CACHE_SIZE)
+_portfolio_address_lock = threading.Lock()  # the cache is read and written from worker threads
+
+# successful logins are remembered briefly so repeat authentication skips bcrypt; failures are never cached.
+# entries are keyed by an HMAC of the password under a per-process secret, so the cache never holds
+# anything that could be checked offline, and a changed password simply misses until the old entry expires
+_LOGIN_CACHE_SECRET = os.urandom(32)
+_login_cache = TTLCache(maxsize=LOGIN_CACHE_MAX_ENTRIES, ttl=LOGIN_CACHE_TTL_SECONDS)
+
+#######################
+### LIFECYCLE HOOKS ###
+#######################
+
+@app.on_event("startup")
+def open_db_pool() -> None:
+    """Opens the process-wide database connection pool"""
+    app.state.db_pool = AWSDBPool(
+        username=os.getenv('RDS_USER'),
+        password=os.getenv('RDS_PASSWORD'),
+        host=os.getenv('RDS_HOST'),
+        database_name=os.getenv('RDS_NAME'),
+        min_connections=DB_POOL_MIN_CONNECTIONS,
+        max_connections=DB_POOL_MAX_CONNECTIONS
+    )
+    # round-trip every pooled connection once so the first requests don't pay for it
+    app.state.db_pool.warm()
+
+@app.on_event("startup")
+def open_s3_client() -> None:
+    """Opens the process-wide S3 client (boto3 clients are thread-safe and meant to be reused)"""
+    app.state.s3 = AWSS3(
+        aws_access_key_id=os.getenv('S3_KEY'),
+        aws_secret_access_key=os.getenv('S3_SECRET'),
+        bucket_name=os.getenv('S3_BUCKET'),
+        max_pool_connections=S3_MAX_POOL_CONNECTIONS
+    )
+
+@app.on_event("shutdown")
+def close_db_pool() -> None:
+    """Closes the process-wide database connection pool"""
+    app.state.db_pool.close()
+
+@app.on_event("shutdown")
+def close_s3_client() -> None:
+    """Closes the process-wide S3 client"""
+    app.state.s3.close()
 
 ######################
 ### HELPER METHODS ###
@@ -34,56 +135,62 @@ DEMO_PORTFOLIO_ID = "7c2114c3-baa6-4c98-9f3c-939f414a4531"
 
 def test_db_connection() -> None:
     """Runs a test to ensure we can connect to the database"""
-    db = AWSDB(username=os.getenv('RDS_USER'), password=os.getenv('RDS_PASSWORD'), host=os.getenv('RDS_HOST'), database_name=os.getenv('RDS_NAME'))
-    db.cursor.execute("SELECT 1")
-    result = db.cursor.fetchone()
-    del db
+    with AWSDB(username=os.getenv('RDS_USER'), password=os.getenv('RDS_PASSWORD'), host=os.getenv('RDS_HOST'), database_name=os.getenv('RDS_NAME')) as db:
+        result = db.test_connection()
     if result:
         print('[ INFO | BACKEND ] Database connection successful')
     else:
         raise Exception('[ ERROR | BACKEND ] Database connection failed')
 
 def test_s3_connection() -> None:
-    """Runs a test to ensure we can connect to S3"""
-    s3 = AWSS3(
+    """Runs a test to ensure we can connect to S3 (opening the client checks the bucket with HeadBucket, raising on failure)"""
+    with AWSS3(
         aws_access_key_id=os.getenv('S3_KEY'),
         aws_secret_access_key=os.getenv('S3_SECRET'),
         bucket_name=os.getenv('S3_BUCKET')
-    )
-    files = s3.list_files()
-    del s3
+    ):
+        pass
     print('[ INFO | BACKEND ] S3 connection successful')
 
-def check_username_exists(username: str) -> bool:
-    """Checks if a username exists in the database"""
-    db = AWSDB(username=os.getenv('RDS_USER'), password=os.getenv('RDS_PASSWORD'), host=os.getenv('RDS_HOST'), database_name=os.getenv('RDS_NAME'))
-    db.cursor.execute("SELECT 1 FROM user_management.accounts WHERE username = %s", (username,))
-    result = db.cursor.fetchone()
-    del db
-    return result is not None
+def get_db_connection() -> ContextManager[AWSDB]:
+    """Checks a database connection out of the pool for the duration of a with-block"""
+    return app.state.db_pool.connection()
 
-def get_db_connection() -> AWSDB:
-    """Gets a database connection"""
-    return AWSDB(username=os.getenv('RDS_USER'), password=os.getenv('RDS_PASSWORD'), host=os.getenv('RDS_HOST'), database_name=os.getenv('RDS_NAME'))
+def fetch_rows(query: str, params: tuple = ()) -> tuple[list[tuple], tuple[str, ...]]:
+    """
+    Runs a read query on a pooled connection; blocking, so async endpoints call it through asyncio.to_thread
+    :param query: the query to run
+    :param params: parameters for the query
+    :return: the result rows and their column names
+    """
+    with get_db_connection() as db:
+        db.cursor.execute(query, params)
+        return db.cursor.fetchall(), tuple(desc[0] for desc in db.cursor.description)
 
 def get_s3_connection() -> AWSS3:
-    """Gets an S3 connection"""
-    return AWSS3(aws_access_key_id=os.getenv('S3_KEY'), aws_secret_access_key=os.getenv('S3_SECRET'), bucket_name=os.getenv('S3_BUCKET'))
+    """Gets the process-wide S3 connection; it outlives requests, so callers must not close it"""
+    return app.state.s3
 
-def verify_portfolio(df: pd.DataFrame) -> bool:
-    """Verifies that the portfolio is well-formed"""
-    # the only permitted columns are 'yf_ticker' and 'quantity'
-    if not set(df.columns) == {'yf_ticker', 'quantity'}:
-        return False
-    # every value in the 'yf_ticker' column must be a string
-    try:
-        df['yf_ticker'].astype(str)
-    except Exception:
-        return False
-    # every value in the 'quantity' column must be an integer
+def verify_portfolio(file_obj: BinaryIO) -> bool:
+    """Verifies that the portfolio CSV is well-formed, parsing it one block at a time rather than all at once"""
+    file_obj.seek(0)
     try:
-        df['quantity'].astype(int)
-    except Exception:
+        reader = pv.open_csv(file_obj, convert_options=PORTFOLIO_CSV_CONVERT_OPTIONS)
+        # the only permitted columns are 'yf_ticker' and 'quantity'
+        if not set(reader.schema.names) == {'yf_ticker', 'quantity'}:
+            return False
+        # every value in the 'yf_ticker' column must be a string
+        if not pa.types.is_string(reader.schema.field('yf_ticker').type):
+            return False
+        # every value in the 'quantity' column must be an integer
+        if not pa.types.is_integer(reader.schema.field('quantity').type):
+            return False
+        # the parser rejects non-integer quantities as each block is converted, so only missing values are left to check
+        for batch in reader:
+            if batch.column('quantity').null_count:
+                return False
+    except pa.ArrowInvalid as e:
+        logger.debug("CSV failed to parse: %s", e)
         return False
     return True
 
@@ -94,54 +201,99 @@ def get_portfolio_df(portfolio_id: str) -> Optional[pd.DataFrame]:
     :return: pandas DataFrame containing the portfolio data, or None if not found
     """
     try:
-        # Get database connection and fetch portfolio address
-        db = get_db_connection()
-        db.cursor.execute(
-            "SELECT portfolio_address FROM user_management.portfolios WHERE portfolio_id = %s",
-            (portfolio_id,)
-        )
-        result = db.cursor.fetchone()
-        
-        if not result:
-            return None
+        # Resolve the portfolio address from the cache, falling back to the database
+        with _portfolio_address_lock:
+            portfolio_address = _portfolio_address_cache.get(portfolio_id)
+        if portfolio_address is None:
+            with get_db_connection() as db:
+                db.cursor.execute(
+                    "SELECT portfolio_address FROM user_management.portfolios WHERE portfolio_id = %s",
+                    (portfolio_id,)
+                )
+                result = db.cursor.fetchone()
             
-        portfolio_address = result[0]
+            if not result:
+                return None
+                
+            portfolio_address = result[0]
+            with _portfolio_address_lock:
+                _portfolio_address_cache[portfolio_id] = portfolio_address
         
-        # Extract the S3 key from the portfolio address by removing the "s3://" prefix and bucket name
-        s3_key = portfolio_address.split('/', 3)[3]
-        
-        # Get S3 connection and download the CSV
-        s3 = get_s3_connection()
-        df = s3.read_csv(s3_key)
+        # Download the CSV over the shared S3 connection
+        df = read_portfolio_csv(get_s3_connection(), portfolio_address)
         
         return df
         
     except Exception as e:
-        print(f"Error getting portfolio CSV: {str(e)}")
+        logger.error("Error getting portfolio CSV: %s", e)
         return None
-    finally:
-        if 'db' in locals(): del db
-        if 's3' in locals(): del s3
+
+def read_portfolio_csv(s3: AWSS3, portfolio_address: str) -> Optional[pd.DataFrame]:
+    """
+    Reads a portfolio CSV from S3 given its stored address
+    :param s3: S3 connection to read with (boto3 clients are safe to share across threads)
+    :param portfolio_address: the portfolio's "s3://bucket/key" address
+    :return: pandas DataFrame containing the portfolio data, or None if not found
+    """
+    # Extract the S3 key from the portfolio address by removing the "s3://" prefix and bucket name
+    s3_key = portfolio_address.split('/', 3)[3]
+    return s3.read_csv(s3_key)
 
 def align_data(factor_df, asset_df):
     # Convert both DataFrames' indices to datetime if they aren't already
-    factor_copy = factor_df.copy()
-    asset_copy = asset_df.copy()
-    factor_copy.index = pd.to_datetime(factor_copy.index)
-    asset_copy.index = pd.to_datetime(asset_copy.index)
+    # (shallow copies share the data buffers, so only the index is rebuilt and the caller's frames are untouched)
+    if not pd.api.types.is_datetime64_any_dtype(factor_df.index):
+        factor_df = factor_df.copy(deep=False)
+        factor_df.index = pd.to_datetime(factor_df.index)
+    if not pd.api.types.is_datetime64_any_dtype(asset_df.index):
+        asset_df = asset_df.copy(deep=False)
+        asset_df.index = pd.to_datetime(asset_df.index)
     
-    # Find common dates between both DataFrames
-    common_dates = factor_copy.index.intersection(asset_copy.index)
-    
-    # Reindex both DataFrames to use only the common dates
-    factor_data = factor_copy.loc[common_dates]
-    asset_data = asset_copy.loc[common_dates]
-
-    # Delete intermediate dfs
-    del factor_copy, asset_copy
+    # Keep only the dates present in both DataFrames
+    factor_data, asset_data = factor_df.align(asset_df, join='inner', axis=0)
     
     return factor_data, asset_data
 
+def returns_cache_key(tickers: list[str], beginning_date: datetime.date, end_date: datetime.date) -> tuple:
+    """Cache key for a returns fetch: the set of tickers and the date range"""
+    return (tuple(sorted(tickers)), str(beginning_date), str(end_date))
+
+# returns for a given window are fixed once published, so repeat analyses reuse them for a few minutes.
+# cached frames are shared between callers and must not be modified in place
+@cached(TTLCache(maxsize=RETURNS_CACHE_MAX_ENTRIES, ttl=RETURNS_CACHE_TTL_SECONDS), key=returns_cache_key, lock=threading.Lock())
+def get_factor_returns(factors: list[str], beginning_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
+    """Gets factor returns from the database using a pooled connection, sharing one query with concurrent callers"""
+    factor_returns = _factor_returns_mdp.get_returns(factors, beginning_date, end_date)
+    factor_returns.index.name = 'date'
+    return factor_returns
+
+@cached(TTLCache(maxsize=RETURNS_CACHE_MAX_ENTRIES, ttl=RETURNS_CACHE_TTL_SECONDS), key=returns_cache_key, lock=threading.Lock())
+def get_portfolio_returns(tickers: list[str], beginning_date: datetime.date, end_date: datetime.date) -> pd.DataFrame:
+    """Gets holdings returns from Yahoo Finance; close prices are also cached in S3 per ticker, so a miss here rarely reaches Yahoo"""
+    portfolio_returns = YahooFinanceMDP(get_s3_connection()).get_returns(tickers, beginning_date, end_date)
+    portfolio_returns.index.name = 'date'
+    return portfolio_returns
+
+def insert_portfolio(portfolio: Portfolio, user_id: str) -> None:
+    """Saves a portfolio and its user_portfolios mapping in one atomic statement"""
+    portfolio_dict = portfolio.model_dump()
+    with get_db_connection() as db:
+        db.cursor.execute(PORTFOLIO_INSERT_QUERY, (*(portfolio_dict[column] for column in PORTFOLIO_COLUMNS), user_id))
+
+def insert_account(account: Account) -> bool:
+    """Saves an account unless its username is taken, in one statement; returns whether it was created"""
+    account_dict = account.model_dump()
+    with get_db_connection() as db:
+        db.cursor.execute(ACCOUNT_INSERT_QUERY, tuple(account_dict[column] for column in ACCOUNT_COLUMNS))
+        return db.cursor.fetchone() is not None
+
+def delete_portfolio(portfolio_id: str) -> None:
+    """Deletes a portfolio (its user_portfolios mapping cascades)"""
+    with _portfolio_address_lock:
+        _portfolio_address_cache.pop(portfolio_id, None)
+    with get_db_connection() as db:
+        db.cursor.execute("DELETE FROM user_management.portfolios WHERE portfolio_id = %s", (portfolio_id,))
+
 def __validate_factor_model(factors: list[str], holdings: list[PortfolioHolding]) -> None:
     """Validates the factor model"""
     if len(factors) == 0:
@@ -167,68 +319,88 @@ async def ping():
 async def get_user_portfolios(user_id: str):
     """Gets a user's portfolios"""
     try:
-        db = get_db_connection()
-        
-        # Get portfolio IDs associated with the user
-        print(f"DEBUG: Fetching portfolios for user_id: {user_id}")
-        db.cursor.execute(
-            "SELECT portfolio_id FROM user_management.user_portfolios WHERE user_id = %s",
-            (user_id,)
+        # Fetch the user's portfolios and the demo portfolio in a single round-trip, off the event loop
+        logger.debug("Fetching portfolios for user_id: %s", user_id)
+        result, column_names = await asyncio.to_thread(
+            fetch_rows,
+            """
+            SELECT p.*
+            FROM user_management.portfolios p
+            JOIN user_management.user_portfolios up USING (portfolio_id)
+            WHERE up.user_id = %s
+            UNION
+            SELECT *
+            FROM user_management.portfolios
+            WHERE portfolio_id = %s
+            """,
+            (user_id, DEMO_PORTFOLIO_ID)
         )
-        portfolio_ids = db.cursor.fetchall()
-        print(f"DEBUG: Found portfolio_ids: {portfolio_ids}")
-        
-        # Extract portfolio IDs from tuples and include demo portfolio
-        if portfolio_ids:
-            portfolio_id_list = [str(id[0]) for id in portfolio_ids]  # Convert UUIDs to strings
-        else:
-            portfolio_id_list = []
-        portfolio_id_list.append(DEMO_PORTFOLIO_ID)
-        print(f"DEBUG: Final portfolio_id_list: {portfolio_id_list}")
-        
-        # Create the parameterized query
-        placeholders = ','.join(['%s'] * len(portfolio_id_list))
-        query = f"SELECT * FROM user_management.portfolios WHERE portfolio_id IN ({placeholders})"
-        print(f"DEBUG: Executing query: {query}")
-        print(f"DEBUG: With parameters: {tuple(portfolio_id_list)}")
         
-        # Execute query with portfolio IDs as parameters
-        db.cursor.execute(query, tuple(portfolio_id_list))
+        # Convert result to list of Portfolio objects, resolving the column layout once for all rows
+        pid_index = column_names.index('portfolio_id')
         
-        result = db.cursor.fetchall()
-        print(f"DEBUG: Query result: {result}")
-        
-        # Convert result to list of Portfolio objects
-        column_names = [desc[0] for desc in db.cursor.description]
-        portfolios = []
-        for row in result:
-            try:
-                # Convert row to list so we can modify it
-                row_list = list(row)
-                # Find index of portfolio_id column
-                pid_index = column_names.index('portfolio_id')
-                # Convert UUID to string
-                row_list[pid_index] = str(row_list[pid_index])
-                # Create Portfolio object
-                portfolio_dict = dict(zip(column_names, row_list))
-                print(f"DEBUG: Creating Portfolio with data: {portfolio_dict}")
-                portfolio = Portfolio(**portfolio_dict)
-                portfolios.append(portfolio)
-            except Exception as e:
-                print(f"DEBUG: Error processing row {row}: {str(e)}")
-                raise
+        # rows come from our own schema-valid table, so skip re-validation
+        def make_portfolio(row: tuple) -> Portfolio:
+            portfolio = Portfolio.model_construct(**dict(zip(column_names, row)))
+            # portfolio_id arrives as a UUID, but the model and clients use its string form
+            portfolio.portfolio_id = str(row[pid_index])
+            return portfolio
         
+        portfolios = list(map(make_portfolio, result))
         return portfolios
         
     except Exception as e:
-        print(f"DEBUG: Error in get_user_portfolios: {str(e)}")
+        logger.error("Error in get_user_portfolios: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching portfolios: {str(e)}"
         )
-    finally:
-        if 'db' in locals():
-            del db
+
+@app.get("/portfolios/holdings")
+async def get_user_portfolios_holdings(user_id: str) -> dict[str, list[PortfolioHolding]]:
+    """Gets the holdings of every portfolio a user can see, keyed by portfolio_id"""
+    try:
+        # Resolve every portfolio address (the user's and the demo portfolio) in a single round-trip
+        result, _ = await asyncio.to_thread(
+            fetch_rows,
+            """
+            SELECT p.portfolio_id, p.portfolio_address
+            FROM user_management.portfolios p
+            JOIN user_management.user_portfolios up USING (portfolio_id)
+            WHERE up.user_id = %s
+            UNION
+            SELECT portfolio_id, portfolio_address
+            FROM user_management.portfolios
+            WHERE portfolio_id = %s
+            """,
+            (user_id, DEMO_PORTFOLIO_ID)
+        )
+    except Exception as e:
+        logger.error("Error in get_user_portfolios_holdings: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error fetching portfolios: {str(e)}")
+
+    # Read the CSVs in parallel over the shared client, capped so a user with many portfolios can't flood S3
+    s3 = get_s3_connection()
+    semaphore = asyncio.Semaphore(S3_MAX_CONCURRENT_READS)
+
+    async def read(portfolio_address: str) -> Optional[pd.DataFrame]:
+        async with semaphore:
+            return await asyncio.to_thread(read_portfolio_csv, s3, portfolio_address)
+
+    dfs = await asyncio.gather(*(read(portfolio_address) for _, portfolio_address in result), return_exceptions=True)
+
+    holdings = {}
+    for (portfolio_id, _), df in zip(result, dfs):
+        # portfolios whose file is missing or unreadable are left out rather than failing the whole request
+        if isinstance(df, Exception):
+            logger.error("Error reading holdings of portfolio %s: %s", portfolio_id, df)
+            continue
+        if df is None:
+            continue
+        portfolio_id = str(portfolio_id)
+        # the CSVs were checked by verify_portfolio on upload, so skip re-validation
+        holdings[portfolio_id] = [PortfolioHolding.model_construct(portfolio_id=portfolio_id, **record) for record in df.to_dict(orient='records')]
+    return holdings
 
 # TODO: get a specific portfolio
 @app.get("/portfolio")
@@ -249,39 +421,42 @@ async def get_portfolio(portfolio_id: str, user_id: str):
 async def get_portfolio_holdings(portfolio_id: str) -> list[PortfolioHolding]:
     """Gets the holdings for a portfolio"""
     try:
-        df = get_portfolio_df(portfolio_id)
+        # the address lookup and the S3 read both block, so run them in a worker thread
+        df = await asyncio.to_thread(get_portfolio_df, portfolio_id)
         if df is None:
             raise HTTPException(status_code=404, detail="Portfolio not found")
             
         # Convert DataFrame rows to dictionaries using column names
-        holdings = [
-            PortfolioHolding(portfolio_id=portfolio_id, **dict(zip(df.columns, row))) 
-            for row in df.values
-        ]
+        records = df.to_dict(orient='records')
+        # the CSV was checked by verify_portfolio on upload, so skip re-validation
+        holdings = [PortfolioHolding.model_construct(portfolio_id=portfolio_id, **record) for record in records]
         return holdings
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching portfolio holdings: {str(e)}")
 
 @app.get("/factors")
 async def get_factors():
     """Gets a list of available factors"""
+    # serve from the in-process cache while it is fresh
+    factors = _factors_cache.get('factors')
+    if factors is not None:
+        return factors
     # queries the database for all factors
     # returns a list of Factor objects
     try:
-        db = get_db_connection()
-        db.cursor.execute("SELECT * FROM factor.factors")
-        result = db.cursor.fetchall()
+        result, column_names = await asyncio.to_thread(fetch_rows, "SELECT * FROM factor.factors")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching factors: {str(e)}")
     # convert result to list of Factor objects
     try:
-        column_names = [desc[0] for desc in db.cursor.description]
-        factors = [Factor(**dict(zip(column_names, row))) for row in result]
+        # rows come from our own schema-valid table, so skip re-validation
+        factors = [Factor.model_construct(**dict(zip(column_names, row))) for row in result]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error converting factors to objects: {str(e)}")
-    finally:
-        del db
+    _factors_cache['factors'] = factors
     return factors
 
 @app.get("/download/{file_path:path}")
@@ -289,39 +464,38 @@ async def download_file(file_path: str):
     """Downloads a file from S3"""
     try:
         s3 = get_s3_connection()
-        file_obj = s3.download_fileobj(file_path)
+        # get_object blocks until S3 responds, so open the body in a worker thread
+        body = await asyncio.to_thread(s3.get_streaming_body, file_path)
         
-        if file_obj is None:
+        if body is None:
             raise HTTPException(status_code=404, detail="File not found")
             
-        # Create a streaming response
+        # Stream the object from S3 to the client chunk by chunk instead of buffering it in memory;
+        # StreamingResponse iterates a sync iterator in its threadpool, so the blocking reads stay off the event loop
         return StreamingResponse(
-            iter([file_obj.getvalue()]),
+            body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE),
             media_type="application/octet-stream",
             headers={
                 "Content-Disposition": f"attachment; filename={file_path.split('/')[-1]}"
             }
         )
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error downloading file: {str(e)}")
-    finally:
-        if 's3' in locals(): del s3
         
 #####################
 ### POST REQUESTS ###
 #####################
 
 @app.post("/account")
-async def create_account(username: str, password: str):
+async def create_account(credentials: Credentials):
     """Creates a new account"""
-    # Check if username already exists
-    if check_username_exists(username):
-        raise HTTPException(status_code=400, detail="Username already exists")
-    
-    # Hash the password
-    salt = bcrypt.gensalt()
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    username, password = credentials.username, credentials.password
+    # Hash the password in a worker thread so the CPU-bound KDF doesn't block the event loop
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    password_hash = (await asyncio.to_thread(bcrypt.hashpw, password.encode('utf-8'), salt)).decode('utf-8')
     
     # Generate UUID for user
     user_id = str(uuid.uuid4())
@@ -333,18 +507,12 @@ async def create_account(username: str, password: str):
         password_hash=password_hash
     )
 
-    # Validate account
-    Account.model_validate(account)
-
-    # Convert account to dict
-    account_dict = account.model_dump()
-    
     # Create account in database
-    db = get_db_connection()
-    
     try:
-        query = f"INSERT INTO user_management.accounts ({', '.join(account_dict.keys())}) VALUES ({', '.join(['%s'] * len(account_dict))})"
-        db.cursor.execute(query, tuple(account_dict.values()))
+        # the username check and the insert are one statement, so concurrent signups can't both claim a name
+        created = await asyncio.to_thread(insert_account, account)
+        if not created:
+            raise HTTPException(status_code=400, detail="Username already exists")
 
         # Return user information instead of just status
         return {
@@ -353,20 +521,29 @@ async def create_account(username: str, password: str):
             "username": username
         }
 
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating account: {str(e)}")
-    finally:
-        del db
 
 @app.post("/login")
-async def login(username: str, password: str):
+async def login(credentials: Credentials):
     """Authenticates a user and returns their account information"""
-    # Get database connection
-    db = get_db_connection()
-    
+    username, password = credentials.username, credentials.password
+    # a recent successful login with the same credentials skips the database and bcrypt entirely
+    cache_key = (username, hmac.new(_LOGIN_CACHE_SECRET, password.encode('utf-8'), hashlib.sha256).digest())
+    user_id = _login_cache.get(cache_key)
+    if user_id is not None:
+        return {
+            "status": "Successfully logged in",
+            "user_id": user_id,
+            "username": username
+        }
+
     try:
         # Get account from database
-        db.cursor.execute(
+        rows, _ = await asyncio.to_thread(
+            fetch_rows,
             """
             SELECT user_id, username, password_hash 
             FROM user_management.accounts 
@@ -374,18 +551,21 @@ async def login(username: str, password: str):
             """, 
             (username,)
         )
-        result = db.cursor.fetchone()
+        result = rows[0] if rows else None
         
         # Check if user exists
         if not result:
+            # still pay for a full bcrypt check so unknown usernames take as long as wrong passwords
+            await asyncio.to_thread(bcrypt.checkpw, password.encode('utf-8'), DUMMY_PASSWORD_HASH)
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
         # Unpack result
         user_id, db_username, stored_hash = result
         
-        # Verify password
-        if not bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
+        # Verify password in a worker thread so the CPU-bound KDF doesn't block the event loop
+        if not await asyncio.to_thread(bcrypt.checkpw, password.encode('utf-8'), stored_hash.encode('utf-8')):
             raise HTTPException(status_code=401, detail="Invalid username or password")
+        _login_cache[cache_key] = user_id
         
         # Return user information instead of just status
         return {
@@ -398,16 +578,14 @@ async def login(username: str, password: str):
         raise  # Re-raise HTTP exceptions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during login: {str(e)}")
-    finally:
-        del db
 
 @app.post("/portfolio")
 async def upload_portfolio(file: UploadFile, portfolio_name: str, user_id: str):
     """Uploads a portfolio CSV file and creates a new portfolio entry"""
     
-    print(f"DEBUG: Starting portfolio upload for user {user_id}")
-    print(f"DEBUG: File name: {file.filename}")
-    print(f"DEBUG: Portfolio name: {portfolio_name}")
+    logger.debug("Starting portfolio upload for user %s", user_id)
+    logger.debug("File name: %s", file.filename)
+    logger.debug("Portfolio name: %s", portfolio_name)
     
     # Verify file is CSV
     if not file.filename.endswith('.csv'):
@@ -417,42 +595,30 @@ async def upload_portfolio(file: UploadFile, portfolio_name: str, user_id: str):
     if not portfolio_name:
         raise HTTPException(status_code=400, detail="Portfolio name cannot be empty.")
     
-    # Read and validate CSV content
+    # Validate CSV content by streaming it straight from the spooled upload, never reading the whole body into memory
     try:
-        print("DEBUG: Reading file contents")
-        contents = await file.read()
-        print("DEBUG: File contents read successfully")
-        print("DEBUG: Attempting to parse CSV")
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        print("DEBUG: CSV parsed successfully")
+        logger.debug("Attempting to parse CSV")
+        well_formed = await asyncio.to_thread(verify_portfolio, file.file)
+        logger.debug("CSV parsed successfully")
     except Exception as e:
-        print(f"DEBUG: Error reading/parsing file: {str(e)}")
+        logger.error("Error reading/parsing file: %s", e)
         raise HTTPException(status_code=500, detail=f"Error reading CSV file: {str(e)}")
         
-    if not verify_portfolio(df):
+    if not well_formed:
         raise HTTPException(status_code=400, detail="Ill-formatted portfolio. Please use the exact format as the demo_portfolio.csv file.")
     
     # Generate unique portfolio ID
     portfolio_id = str(uuid.uuid4())
     
+    # The S3 key is derived from the portfolio_id, so the address is known before anything is written
+    s3_path = f"portfolios/{portfolio_id}.csv"
+    s3 = get_s3_connection()
+    
     try:
-        # Upload to S3
-        print("DEBUG: Attempting to upload file to S3")
-        s3 = get_s3_connection()
-        s3_path = f"portfolios/{portfolio_id}.csv"
-        # Create BytesIO object with the contents
-        file_obj = io.BytesIO(contents)
-        address = s3.upload_fileobj(file_obj, s3_path)
-        print(f"DEBUG: File uploaded to S3 at {address}")
-
-        if not address:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload portfolio to storage"
-            )
+        address = s3.get_s3_uri(s3_path)
         
         # Create Portfolio record
-        print("DEBUG: Creating portfolio record")
+        logger.debug("Creating portfolio record")
         portfolio = Portfolio(
             portfolio_id=portfolio_id,
             user_id=user_id,
@@ -460,25 +626,32 @@ async def upload_portfolio(file: UploadFile, portfolio_name: str, user_id: str):
             portfolio_address=address
         )
         
-        # Validate portfolio
-        Portfolio.model_validate(portfolio)
+        # The S3 upload and the database insert are independent, so run them concurrently
+        # The spooled upload is streamed to S3 (multipart once it is large enough) rather than buffered first
+        logger.debug("Uploading file to S3 and saving portfolio to database")
+        uploaded, inserted = await asyncio.gather(
+            asyncio.to_thread(s3.upload_fileobj, file.file, s3_path),
+            asyncio.to_thread(insert_portfolio, portfolio, user_id),
+            return_exceptions=True
+        )
+        upload_failed = uploaded is None or isinstance(uploaded, Exception)
+        insert_failed = isinstance(inserted, Exception)
+        
+        # Undo whichever half succeeded so a failed upload leaves neither an orphaned row nor an orphaned file
+        if upload_failed and not insert_failed:
+            await asyncio.to_thread(delete_portfolio, portfolio_id)
+        if insert_failed and not upload_failed:
+            await asyncio.to_thread(s3.delete_file, s3_path)
         
-        # Save to database
-        print("DEBUG: Saving portfolio to database")
-        db = get_db_connection()
-        portfolio_dict = portfolio.model_dump()
-        query = f"""
-            INSERT INTO user_management.portfolios 
-            ({', '.join(portfolio_dict.keys())}) 
-            VALUES ({', '.join(['%s'] * len(portfolio_dict))})
-        """
-        db.cursor.execute(query, tuple(portfolio_dict.values()))
-        print("DEBUG: Portfolio saved to database")
-
-        # Upload a record to the user_portfolios mapping table
-        print("DEBUG: Uploading record to user_portfolios mapping table")
-        db.cursor.execute("INSERT INTO user_management.user_portfolios (user_id, portfolio_id) VALUES (%s, %s)", (user_id, portfolio_id))
-        print("DEBUG: Record uploaded to user_portfolios mapping table")
+        if upload_failed:
+            logger.error("Error uploading portfolio to S3: %s", uploaded)
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to upload portfolio to storage"
+            )
+        if insert_failed:
+            raise inserted
+        logger.debug("Portfolio uploaded to %s and saved to database", address)
         
         return {
             "status": "Portfolio uploaded successfully",
@@ -486,12 +659,11 @@ async def upload_portfolio(file: UploadFile, portfolio_name: str, user_id: str):
             "portfolio_name": portfolio_name
         }
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
     except Exception as e:
-        print(f"DEBUG: Error during portfolio upload: {str(e)}")
+        logger.error("Error during portfolio upload: %s", e)
         raise HTTPException(status_code=500, detail=f"Error uploading portfolio: {str(e)}")
-    finally:
-        if 'db' in locals(): del db
-        if 's3' in locals(): del s3
 
 @app.post("/analysis/validate_factor_model")
 async def validate_factor_model(factors: list[str], holdings: list[PortfolioHolding]) -> bool:
@@ -506,89 +678,69 @@ async def analyze_factor_model(factors: list[str], holdings: list[PortfolioHoldi
     Analyzes a portfolio using the specified factors
     Returns a JSON containing the analysis results
     """
-    print(f"DEBUG: Starting factor model analysis")
-    print(f"DEBUG: Received factors: {factors}")
-    print(f"DEBUG: Received holdings: {[h.model_dump() for h in holdings]}")
+    logger.debug("Starting factor model analysis")
+    logger.debug("Received factors: %s", factors)
+    logger.debug("Received holdings: %s", holdings)
 
-    # model validate each holding
-    for holding in holdings:
-        PortfolioHolding.model_validate(holding)
-    
+    # holdings were already validated by FastAPI when the request body was parsed
     holdings_tickers = [str(h.yf_ticker) for h in holdings]
     
     # validate the factor model first
     if not __validate_factor_model(factors, holdings_tickers):
-        print("DEBUG: Factor model validation failed")
+        logger.debug("Factor model validation failed")
         raise HTTPException(status_code=400, detail="Invalid factor model")
-    print("DEBUG: Factor model validation passed")
+    logger.debug("Factor model validation passed")
     
     # start today and go back one year
     beginning_date = datetime.date.today() - datetime.timedelta(days=365)
     end_date = datetime.date.today()
-    print(f"DEBUG: Analysis period: {beginning_date} to {end_date}")
+    logger.debug("Analysis period: %s to %s", beginning_date, end_date)
     
-    # get data for factors
-    try:
-        print("DEBUG: Fetching factor data")
-        db = get_db_connection()
-        mdp = DatabaseMDP(db)
-        factor_returns = mdp.get_returns(factors, beginning_date, end_date)
-    except Exception as e:
-        print(f"DEBUG: Error fetching factor data: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error fetching factor data: {str(e)}")
-
-    # get data for holdings
-    try:
-        print("DEBUG: Fetching portfolio data")
-        yfmdp = YahooFinanceMDP()
-        portfolio_returns = yfmdp.get_returns(holdings_tickers, beginning_date, end_date)
-    except Exception as e:
-        print(f"DEBUG: Error fetching portfolio data: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error fetching portfolio data: {str(e)}")
-    
-    factor_returns.index.name = 'date'
-    portfolio_returns.index.name = 'date'
-    print("DEBUG: Set index names to 'date'")
+    # get data for factors (database) and holdings (Yahoo Finance) concurrently
+    logger.debug("Fetching factor and portfolio data")
+    factor_returns, portfolio_returns = await asyncio.gather(
+        asyncio.to_thread(get_factor_returns, factors, beginning_date, end_date),
+        asyncio.to_thread(get_portfolio_returns, holdings_tickers, beginning_date, end_date),
+        return_exceptions=True
+    )
+    if isinstance(factor_returns, Exception):
+        logger.error("Error fetching factor data: %s", factor_returns)
+        raise HTTPException(status_code=500, detail=f"Error fetching factor data: {str(factor_returns)}")
+    if isinstance(portfolio_returns, Exception):
+        logger.error("Error fetching portfolio data: %s", portfolio_returns)
+        raise HTTPException(status_code=500, detail=f"Error fetching portfolio data: {str(portfolio_returns)}")
 
     # align the data
     try:
-        print("DEBUG: Aligning factor and portfolio data")
+        logger.debug("Aligning factor and portfolio data")
         factor_df, portfolio_df = align_data(factor_returns, portfolio_returns)
-        print(f"DEBUG: Aligned data shapes - Factors: {factor_df.shape}, Portfolio: {portfolio_df.shape}")
-        print(f"DEBUG: Date range: {factor_df.index.min()} to {factor_df.index.max()}")
+        logger.debug("Aligned data shapes - Factors: %s, Portfolio: %s", factor_df.shape, portfolio_df.shape)
     except Exception as e:
-        print(f"DEBUG: Error aligning data: {str(e)}")
+        logger.error("Error aligning data: %s", e)
         raise HTTPException(status_code=500, detail=f"Error aligning data: {str(e)}")
     
-    print(f"DEBUG: Factor returns head:\n{factor_df.head()}")
-    print(f"DEBUG: Portfolio returns head:\n{portfolio_df.head()}")
-    print(f"DEBUG: Factor returns info:\n{factor_df.info()}")
-    print(f"DEBUG: Portfolio returns info:\n{portfolio_df.info()}")
     # # convert the date index values to strings
     # factor_df.index = factor_df.index.astype(str)
     # portfolio_df.index = portfolio_df.index.astype(str)
 
     # run a LinearFactorModel
     try:
-        print("DEBUG: Fitting linear factor model")
+        logger.debug("Fitting linear factor model")
         model = LinearFactorModel(portfolios=portfolio_df, factors=factor_df)
-        res = model.fit()
+        # the GMM fit is CPU-bound numpy/BLAS work, so keep it off the event loop
+        res = await asyncio.to_thread(model.fit)
         model_rsq = res.rsquared
         model_no_assets = len(res.params)
         model_no_factors = len(factor_df.columns)
         model_j_stat = res.j_statistic.stat
         params = res.params
-        print(f"DEBUG: Model fit complete")
-        print(f"DEBUG: R-squared: {model_rsq:.4f}")
-        print(f"DEBUG: Number of assets: {model_no_assets}")
-        print(f"DEBUG: Number of factors: {model_no_factors}")
-        print(f"DEBUG: J-statistic: {model_j_stat:.4f}")
+        logger.debug("Model fit complete - R-squared: %.4f, assets: %d, factors: %d, J-statistic: %.4f", model_rsq, model_no_assets, model_no_factors, model_j_stat)
     except Exception as e:
-        print(f"DEBUG: Error fitting factor model: {str(e)}")
+        logger.error("Error fitting factor model: %s", e)
         raise HTTPException(status_code=500, detail=f"Error fitting factor model: {str(e)}")
     
     try:
-        print("DEBUG: Preparing response")
+        logger.debug("Preparing response")
         response = {
             "status": "success",
             "analysis": {
@@ -605,11 +757,10 @@ async def analyze_factor_model(factors: list[str], holdings: list[PortfolioHoldi
                 "timestamp": str(datetime.datetime.now())
             }
         }
-        print(f"DEBUG: Final response: {response}")
         return response
         
     except Exception as e:
-        print(f"DEBUG: Error preparing response: {str(e)}")
+        logger.error("Error preparing response: %s", e)
         raise HTTPException(status_code=500, detail=f"Error performing factor analysis: {str(e)}")
 
 if __name__ == "__main__":
@@ -620,4 +771,6 @@ if __name__ == "__main__":
         print(f"[ ERROR | BACKEND ] Failed to connect to database or S3: {str(e)}")
         exit(1)
     print("[ INFO | BACKEND ] Starting API")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # one worker process per core (overridable like the uvicorn CLI via WEB_CONCURRENCY), each opening its own pool on startup
+    workers = int(os.getenv('WEB_CONCURRENCY', max(2, os.cpu_count() or 1)))
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools", workers=workers, proxy_headers=True)
@@ -1,7 +1,13 @@
 # imports
+import io
+import os
 import psycopg2
+import threading
 import pandas as pd
-from typing import Optional
+from contextlib import contextmanager
+from psycopg2.extras import execute_batch
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from typing import Iterator, Optional
 
 class AWSDB():
     """
@@ -28,22 +34,55 @@ class AWSDB():
         )
         self.cursor = self.connection.cursor()
         self.connection.autocommit = auto_commit
-        print(f'Connected to database: {database_name}')
-        self.__test_connection()
+        self._owns_connection = True
+        if os.getenv('DB_VERBOSE'):
+            print(f'Connected to database: {database_name}')
+
+    @classmethod
+    def from_connection(cls, connection, auto_commit: Optional[bool] = True) -> 'AWSDB':
+        """
+        Wraps an already-open connection, e.g. one checked out of an AWSDBPool.
+        The wrapped connection is left open when the wrapper is closed.
+        :param connection: an open psycopg2 connection
+        :param auto_commit: whether to automatically commit changes to the database
+        :return: an AWSDB using the given connection
+        """
+        db = cls.__new__(cls)
+        db.connection = connection
+        db.connection.autocommit = auto_commit
+        db.cursor = connection.cursor()
+        db._owns_connection = False
+        return db
         
-    def __test_connection(self) -> None:
+    def test_connection(self) -> list:
         """
-        Tests the connection to the database
+        Tests the connection to the database. Costs a round-trip, so only call it for explicit health checks
+        :return: the server version row
         """
         self.execute('SELECT version();')
         version = self.fetch()
         print(f'Test Passed: {version}')
+        return version
+
+    def __enter__(self) -> 'AWSDB':
+        """
+        Returns the database for use in a with-block
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Closes the database connection when the with-block exits
+        """
+        self.close()
 
-    def __del__(self) -> None:
+    def close(self) -> None:
         """
-        Closes the database connection
+        Closes the cursor, and the connection unless it is borrowed from a pool
         """
-        self.connection.close()
+        self.cursor.close()
+        if self._owns_connection:
+            self.connection.close()
 
     def execute(self, query: str, *params) -> None:
         """
@@ -65,18 +104,20 @@ class AWSDB():
                 self.connection.rollback()
                 raise Exception(f'Error executing query: {query}')
 
-    def execute_many(self, queries: list, batch_size: Optional[int] = 100) -> None:
+    def execute_many(self, query: str, params_seq: list[tuple], batch_size: Optional[int] = 500) -> None:
         """
-        Executes a list of queries with optional parameters
-        :param queries: the queries to execute
-        :param batch_size: the size of the batch to execute
+        Executes one parameterized query for every set of parameters, sending batch_size executions per round-trip
+        :param query: the query to execute, with %s placeholders for the parameters (never concatenated values)
+        :param params_seq: the parameters for each execution
+        :param batch_size: the number of executions sent per round-trip
         """
-        
-        for i in range(0, len(queries), batch_size):
-            batch = queries[i:i+batch_size]
-            batch = [self._cleaned_statement(x) for x in batch]
-            batch_sql = '\n'.join(batch)
-            self.execute(batch_sql)
+        # execute_batch joins the statements with ';' itself, so strip any trailing one
+        query = query.strip().rstrip(';')
+        try:
+            execute_batch(self.cursor, query, params_seq, page_size=batch_size)
+        except:
+            self.connection.rollback()
+            raise Exception(f'Error executing query: {query} for {len(params_seq)} parameter sets')
             
     def fetch(self) -> list:
         """
@@ -105,6 +146,25 @@ class AWSDB():
         df = pd.DataFrame(json_data)
         return df
     
+    def copy_df(self, query, params: Optional[tuple] = None) -> pd.DataFrame:
+        """
+        Runs a query through COPY ... TO STDOUT and parses the CSV stream into a DataFrame,
+        skipping psycopg2's per-row tuple construction
+        :param query: the query to run (a string or a psycopg2.sql composition)
+        :param params: optional parameters for the query, bound client-side since COPY takes none
+        :return: the results of the query
+        """
+        statement = self.cursor.mogrify(query, params).decode(psycopg2.extensions.encodings[self.connection.encoding])
+        statement = statement.strip().rstrip(';')
+        buffer = io.BytesIO()
+        try:
+            self.cursor.copy_expert(f'COPY ({statement}) TO STDOUT WITH CSV HEADER', buffer)
+        except:
+            self.connection.rollback()
+            raise Exception(f'Error copying query: {statement}')
+        buffer.seek(0)
+        return pd.read_csv(buffer, engine='pyarrow')
+    
     def _cleaned_statement(self, statement: str) -> str:
         """
         Cleans a statement by removing leading and trailing whitespace and semicolons
@@ -115,4 +175,107 @@ class AWSDB():
         if not statement.endswith(';'):
             statement = statement + ';'
 
-        return statement
\ No newline at end of file
+        return statement
+
+class AWSDBPool():
+    """
+    Thread-safe pool of connections to an AWS PostgreSQL database.
+    """
+
+    def __init__(self, username: str, password: str, host: str, database_name: str, min_connections: Optional[int] = 5, max_connections: Optional[int] = 20, checkout_timeout: Optional[float] = 30.0, auto_commit: Optional[bool] = True, database_port: Optional[int] = 5432) -> None:
+        """
+        Opens a pool of connections to the specified AWS PostgreSQL database.
+        :param username: username for the database
+        :param password: password for the database
+        :param host: host for the database
+        :param database_name: name of the database
+        :param min_connections: number of connections opened up front and kept alive
+        :param max_connections: maximum number of connections the pool will open
+        :param checkout_timeout: seconds to wait for a free connection before raising PoolError
+        :param auto_commit: whether to automatically commit changes to the database
+        :param database_port: port for the database
+        """
+
+        self.pool = ThreadedConnectionPool(
+            minconn=min_connections,
+            maxconn=max_connections,
+            host=host,
+            database=database_name,
+            user=username,
+            password=password,
+            port=str(database_port)
+        )
+        self.auto_commit = auto_commit
+        self.min_connections = min_connections
+        self.checkout_timeout = checkout_timeout
+        # ThreadedConnectionPool raises PoolError when every connection is checked out, so callers
+        # hold a permit while they have a connection and wait (up to checkout_timeout) for one to be returned instead
+        self._available = threading.BoundedSemaphore(max_connections)
+        print(f'Opened connection pool to database: {database_name}')
+
+    def warm(self) -> None:
+        """
+        Checks out every pre-opened connection at once and runs a trivial query on each,
+        so broken connections surface at startup rather than on the first requests
+        """
+        connections = []
+        try:
+            for _ in range(self.min_connections):
+                self._acquire()
+                try:
+                    connections.append(self.pool.getconn())
+                except:
+                    self._available.release()
+                    raise
+            for connection in connections:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                connection.rollback()
+        finally:
+            for connection in connections:
+                self.pool.putconn(connection, close=bool(connection.closed))
+                self._available.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[AWSDB]:
+        """
+        Checks a connection out of the pool for the duration of a with-block.
+        Waits for a free connection when the pool is exhausted, so call it from a worker thread, never the event loop
+        :return: an AWSDB wrapping the pooled connection
+        """
+        self._acquire()
+        try:
+            connection = self.pool.getconn()
+        except:
+            self._available.release()
+            raise
+        try:
+            db = AWSDB.from_connection(connection, auto_commit=self.auto_commit)
+            try:
+                yield db
+            finally:
+                db.cursor.close()
+        finally:
+            # reset any transaction left open by the caller before handing the connection back
+            if not connection.closed:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    connection.close()
+            # connections broken mid-request are discarded rather than reused
+            self.pool.putconn(connection, close=bool(connection.closed))
+            self._available.release()
+
+    def _acquire(self) -> None:
+        """
+        Takes a permit for one connection, waiting up to checkout_timeout for another caller to return theirs
+        """
+        if not self._available.acquire(timeout=self.checkout_timeout):
+            raise PoolError(f'Timed out after {self.checkout_timeout}s waiting for a free database connection')
+
+    def close(self) -> None:
+        """
+        Closes every connection in the pool
+        """
+        self.pool.closeall()
@@ -1,8 +1,70 @@
 # imports
+import numpy as np
 import pandas as pd
 import datetime
+import threading
+import time
 import yfinance as yf
+from concurrent.futures import Future, ThreadPoolExecutor
+from psycopg2 import sql
+from typing import Callable, ContextManager, Optional
 from db import AWSDB
+from s3 import AWSS3
+
+YF_CACHE_PREFIX = 'yf'
+YF_CACHE_MAX_WORKERS = 16  # concurrent S3 reads/writes of cached tickers
+YF_RETRY_BACKOFF_SECONDS = 1.0  # pause before re-requesting tickers that came back empty (e.g. after a 429)
+# yf.download collects its results in module-global state (shared._DFS), so concurrent calls would mix
+# up each other's tickers; downloads from different requests take turns
+YF_DOWNLOAD_LOCK = threading.Lock()
+
+def drop_sparse_returns(returns: pd.DataFrame, null_threshold: float) -> pd.DataFrame:
+    """
+    Drops columns where at least threshold% of values are null, then any row that still has a null,
+    using a single NaN mask over the float matrix instead of separate pandas passes
+    """
+    # a frame that is already all float64 is viewed rather than copied here
+    values = returns.to_numpy(dtype=np.float64)
+    mask = np.isnan(values)
+    keep_columns = mask.mean(axis=0) < null_threshold
+    keep_rows = ~mask[:, keep_columns].any(axis=1)
+    return pd.DataFrame(
+        values[np.ix_(keep_rows, keep_columns)],
+        index=returns.index[keep_rows],
+        columns=returns.columns[keep_columns]
+    )
+
+def pct_change(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Period-over-period returns computed in one vectorized NumPy pass (no shifted intermediate frame).
+    Gaps are not forward-filled, so a missing price leaves nulls that drop_sparse_returns removes
+    """
+    values = prices.to_numpy(dtype=np.float64)
+    returns = np.empty_like(values)
+    returns[:1] = np.nan
+    np.divide(values[1:], values[:-1], out=returns[1:])
+    returns[1:] -= 1.0
+    return pd.DataFrame(returns, index=prices.index, columns=prices.columns)
+
+def to_date_index(index: pd.Index) -> pd.DatetimeIndex:
+    """
+    Converts an index of dates to a timezone-naive DatetimeIndex at midnight, so indexes from different
+    sources align; it stays int64-backed rather than becoming an array of Python date objects
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+def finish_returns(returns: pd.DataFrame, null_threshold: float) -> pd.DataFrame:
+    """Applies the shared get_returns post-processing to a wide frame of raw returns"""
+
+    # Drop sparse columns, then any remaining rows with null values (the result is all floats)
+    returns = drop_sparse_returns(returns, null_threshold)
+
+    # Index by date as a DatetimeIndex (callers get Timestamps, not datetime.date objects)
+    returns.index = to_date_index(returns.index)
+    return returns
 
 class IMDP:
     """Interface for a market data platform."""
@@ -12,10 +74,10 @@ class IMDP:
         pass
 
 class YahooFinanceMDP(IMDP):
-    """Market data platform using Yahoo Finance"""
+    """Market data platform using Yahoo Finance, optionally caching close prices in S3"""
 
-    def __init__(self):
-        pass
+    def __init__(self, s3: Optional[AWSS3] = None):
+        self.s3 = s3
 
     def get_returns(self, tickers: list[str] | str, beginning_date: datetime.date | str, end_date: datetime.date | str, null_threshold: float = 0.1) -> pd.DataFrame:
         """
@@ -31,32 +93,134 @@ class YahooFinanceMDP(IMDP):
         if isinstance(tickers, str):
             tickers = [tickers]
 
-        # Download data for all tickers at once
-        stock_data = yf.download(
-            tickers=tickers,
-            start=str(beginning_date),
-            end=str(end_date),
-            interval='1d'
-        )
+        prices = self.get_prices(tickers, beginning_date, end_date)
+        returns = pct_change(prices)
 
-        prices = stock_data['Close']
-        returns = prices.pct_change()
+        return finish_returns(returns, null_threshold)
 
-        # Drop columns (tickers) where more than threshold% of values are null
-        null_pct = returns.isnull().mean()
-        cols_to_keep = null_pct[null_pct < null_threshold].index
-        returns = returns[cols_to_keep]
+    def get_prices(self, tickers: list[str], beginning_date: datetime.date | str, end_date: datetime.date | str) -> pd.DataFrame:
+        """
+        Get the daily close prices for a list of tickers between two dates, one column per ticker.
+        With an S3 connection, each ticker's prices are cached in one Parquet object that records the range it
+        covers: a cached ticker only downloads the days after that range, and the rest download the whole range
 
-        # Then drop any remaining rows with null values
-        returns = returns.dropna()
+        Parameters:
+            tickers (list[str]): The tickers to get prices for
+            beginning_date (datetime.date | str): The beginning date to get prices for
+            end_date (datetime.date | str): The end date (exclusive, as in yfinance) to get prices for
+        """
+
+        if self.s3 is None:
+            return self._download_prices_with_retry(tickers, beginning_date, end_date)
+
+        start, end = pd.Timestamp(beginning_date), pd.Timestamp(end_date)
+
+        # Read every cached ticker concurrently; a miss comes back as None
+        keys = {ticker: self._cache_key(ticker) for ticker in tickers}
+        with ThreadPoolExecutor(max_workers=YF_CACHE_MAX_WORKERS) as executor:
+            cached = dict(zip(keys, executor.map(self.s3.read_parquet, keys.values())))
+
+        # Group the downloads by where each ticker's prices run out, so tickers missing the same days share one call
+        frames = {}
+        uncached = []
+        gaps: dict[pd.Timestamp, list[str]] = {}
+        for ticker, entry in cached.items():
+            covered = self._covered_range(entry)
+            if covered is None or covered[0] > start:
+                uncached.append(ticker)
+                continue
+            frames[ticker] = entry[0]
+            # a gap without weekdays (e.g. a weekend) has no closes to fetch
+            if np.busday_count(covered[1].date(), end.date()) > 0:
+                gaps.setdefault(covered[1], []).append(ticker)
+        downloads = [(gap_start, gap_tickers, True) for gap_start, gap_tickers in gaps.items()]
+        if uncached:
+            downloads.append((start, uncached, False))
 
-        # Ensure all date values are datetime.date objects
-        returns.index = pd.to_datetime(returns.index).date
+        # Download the missing days and append them; only tickers that came back with data are updated,
+        # so a failed or rate-limited download is never cached
+        updated = []
+        for gap_start, gap_tickers, is_gap in downloads:
+            downloaded = self._download_prices_with_retry(gap_tickers, gap_start.date(), end.date(), empty_ok=is_gap)
+            # a gap that comes back without a single bar only spanned holidays, so its coverage still moves forward
+            holiday = is_gap and not downloaded.notna().to_numpy().any()
+            for ticker in gap_tickers:
+                if ticker not in downloaded.columns or downloaded[ticker].isna().all():
+                    if holiday:
+                        updated.append(ticker)
+                    continue
+                fetched = downloaded[[ticker]].dropna()
+                fetched.index = to_date_index(fetched.index)
+                if ticker in frames:
+                    fetched = pd.concat([frames[ticker], fetched])
+                    fetched = fetched[~fetched.index.duplicated(keep='last')]
+                frames[ticker] = fetched
+                updated.append(ticker)
 
-        # ensure all returns are floats
-        returns = returns.astype(float)
+        # Write back the updated tickers trimmed to this window, so each object stays about one window long
+        metadata = {'start': str(start.date()), 'end': str(end.date())}
+        with ThreadPoolExecutor(max_workers=YF_CACHE_MAX_WORKERS) as executor:
+            list(executor.map(
+                lambda ticker: self.s3.upload_parquet(frames[ticker][frames[ticker].index >= start], keys[ticker], metadata),
+                updated
+            ))
+
+        if not frames:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        prices = pd.concat([frames[ticker] for ticker in tickers if ticker in frames], axis=1).sort_index()
+        return prices[(prices.index >= start) & (prices.index < end)]
+
+    def _download_prices(self, tickers: list[str], beginning_date: datetime.date | str, end_date: datetime.date | str) -> pd.DataFrame:
+        """Downloads daily close prices from Yahoo Finance, one column per ticker"""
+
+        # Download data for all tickers at once. yfinance fans the tickers out over worker threads
+        # and reuses its process-wide HTTP session, so connections stay warm across requests
+        with YF_DOWNLOAD_LOCK:
+            stock_data = yf.download(
+                tickers=tickers,
+                start=str(beginning_date),
+                end=str(end_date),
+                interval='1d',
+                threads=True,
+                progress=False
+            )
+
+        # a range with no trading days comes back empty, without a Close column
+        if stock_data.empty:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        prices = stock_data['Close']
+        # older yfinance releases return a bare Series for a single ticker
+        if isinstance(prices, pd.Series):
+            prices = prices.to_frame(tickers[0])
+        return prices
 
-        return returns
+    def _download_prices_with_retry(self, tickers: list[str], beginning_date: datetime.date | str, end_date: datetime.date | str, empty_ok: bool = False) -> pd.DataFrame:
+        """
+        Downloads daily close prices, retrying once for tickers that came back empty.
+        yfinance reports per-ticker failures (rate limits, timeouts) as all-null columns rather than raising.
+        With empty_ok the range may hold no trading days (e.g. a holiday), so an entirely empty result isn't retried
+        """
+        prices = self._download_prices(tickers, beginning_date, end_date)
+        failed = [ticker for ticker in tickers if ticker not in prices.columns or prices[ticker].isna().all()]
+        if not failed or (empty_ok and len(failed) == len(tickers)):
+            return prices
+
+        time.sleep(YF_RETRY_BACKOFF_SECONDS)
+        retried = self._download_prices(failed, beginning_date, end_date)
+        recovered = [ticker for ticker in retried.columns if retried[ticker].notna().any()]
+        if recovered:
+            prices = prices.drop(columns=recovered, errors='ignore').join(retried[recovered], how='outer')
+        return prices
+
+    def _cache_key(self, ticker: str) -> str:
+        """S3 key of a ticker's cached close prices; one object per ticker, extended as new days are fetched"""
+        return f"{YF_CACHE_PREFIX}/{ticker}.parquet"
+
+    def _covered_range(self, entry: Optional[tuple[pd.DataFrame, dict[str, str]]]) -> Optional[tuple[pd.Timestamp, pd.Timestamp]]:
+        """The [start, end) range a cached object holds every close for, or None if it isn't cached"""
+        if entry is None or 'start' not in entry[1] or 'end' not in entry[1]:
+            return None
+        return pd.Timestamp(entry[1]['start']), pd.Timestamp(entry[1]['end'])
     
 class DatabaseMDP(IMDP):
     """Market data platform using a database"""
@@ -65,60 +229,123 @@ class DatabaseMDP(IMDP):
         self.db = db
 
     def get_returns(self, tickers: list[str] | str, beginning_date: datetime.date | str, end_date: datetime.date | str, null_threshold: float = 0.1) -> pd.DataFrame:
+        if isinstance(tickers, str):
+            tickers = [tickers]
+
+        factor_returns = self.get_wide_returns(tickers, beginning_date, end_date)
+        return finish_returns(factor_returns, null_threshold)
+
+    def get_wide_returns(self, tickers: list[str], beginning_date: datetime.date | str, end_date: datetime.date | str) -> pd.DataFrame:
+        """Gets raw factor returns as a date-indexed frame with one column per factor (all factors if none are given)"""
         # Convert dates to strings if they're datetime objects
         beginning_date = str(beginning_date)
         end_date = str(end_date)
         
         if tickers:
-            # Add quotes around each ticker
-            quoted_tickers = [f"'{ticker}'" for ticker in tickers]
-            query = """
-                SELECT date::date as date, factor_id, return_value 
+            # Pivot server-side: one FILTER aggregate per factor, so each row arrives already wide as
+            # (date, factor_1, factor_2, ...) instead of one long-format row per factor per date
+            factor_columns = sql.SQL(', ').join(
+                sql.SQL('MAX(return_value::float8) FILTER (WHERE factor_id = %s) AS {}').format(sql.Identifier(ticker))
+                for ticker in tickers
+            )
+            query = sql.SQL("""
+                SELECT date::date as date, {}
                 FROM factor.returns 
-                WHERE factor_id IN ({}) 
+                WHERE factor_id = ANY(%s) 
                 AND date >= %s::date 
                 AND date <= %s::date 
-                ORDER BY date
-            """.format(', '.join(quoted_tickers))
-            self.db.cursor.execute(query, (beginning_date, end_date))
+                GROUP BY 1
+                ORDER BY 1
+            """).format(factor_columns)
+            # Stream the result through COPY so it is parsed as columns rather than built row by row
+            factor_returns = self.db.copy_df(query, (*tickers, list(tickers), beginning_date, end_date)).set_index('date')
         else:
+            # Without a factor list the columns aren't known up front, so fetch long-format rows and pivot
             query = """
-                SELECT date::date as date, factor_id, return_value 
+                SELECT date::date as date, factor_id, return_value::float8 as return_value 
                 FROM factor.returns 
                 WHERE date >= %s::date 
                 AND date <= %s::date 
                 ORDER BY date
             """
-            self.db.cursor.execute(query, (beginning_date, end_date))
+            # Stream the result through COPY so it is parsed as columns rather than built row by row
+            factor_returns = self.db.copy_df(query, (beginning_date, end_date))
 
-        # Get column names from cursor description
-        columns = [desc[0] for desc in self.db.cursor.description]
-        
-        # Fetch all rows
-        rows = self.db.cursor.fetchall()
-        
-        # Create DataFrame with explicit column names
-        factor_returns = pd.DataFrame(rows, columns=columns)
+            # Pivot the DataFrame
+            factor_returns = factor_returns.pivot(
+                index='date',
+                columns='factor_id',
+                values='return_value'
+            )
 
-        # Pivot the DataFrame
-        factor_returns = factor_returns.pivot(
-            index='date',
-            columns='factor_id',
-            values='return_value'
-        )
+        factor_returns.index = to_date_index(factor_returns.index)
+        return factor_returns
 
-        # Drop columns where more than threshold% of values are null
-        null_pct = factor_returns.isnull().mean()
-        cols_to_keep = null_pct[null_pct < null_threshold].index
-        factor_returns = factor_returns[cols_to_keep]
+class CoalescingDatabaseMDP(IMDP):
+    """
+    Database market data platform that merges concurrent calls: calls arriving within a short window share
+    one query over the union of their factors and date ranges, and each caller gets back its own slice.
+    The window is only waited out while other calls are in flight; a lone call queries straight away
+    """
+
+    def __init__(self, connection: Callable[[], ContextManager[AWSDB]], window_seconds: float = 0.05):
+        """
+        :param connection: returns a context manager yielding a database connection, e.g. AWSDBPool.connection
+        :param window_seconds: how long the first caller in a batch waits for others to join it, when others are in flight
+        """
+        self.connection = connection
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending: list[tuple[list[str], pd.Timestamp, pd.Timestamp, Future]] = []
+        self._in_flight = 0  # get_returns calls currently running, pending or querying
 
-        # Then drop any remaining rows with null values
-        factor_returns = factor_returns.dropna()
+    def get_returns(self, tickers: list[str] | str, beginning_date: datetime.date | str, end_date: datetime.date | str, null_threshold: float = 0.1) -> pd.DataFrame:
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        beginning_date = pd.Timestamp(beginning_date)
+        end_date = pd.Timestamp(end_date)
 
-        # Ensure all date values are datetime.date objects
-        factor_returns.index = pd.to_datetime(factor_returns.index).date
+        # Join the pending batch; whoever opens a batch waits out the window and then runs it for everyone
+        future = Future()
+        with self._lock:
+            self._pending.append((list(tickers), beginning_date, end_date, future))
+            leader = len(self._pending) == 1
+            # with no other call in flight nothing is about to join, so don't delay the query
+            concurrent = self._in_flight > 0
+            self._in_flight += 1
+        try:
+            if leader:
+                if concurrent:
+                    time.sleep(self.window_seconds)
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                self._run_batch(batch)
+            factor_returns = future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
 
-        # ensure all returns are floats
-        factor_returns = factor_returns.astype(float)
+        # Slice this caller's factors and dates out of the shared result before filtering, as a lone query would
+        factor_returns = factor_returns.loc[beginning_date:end_date]
+        if tickers:
+            factor_returns = factor_returns.reindex(columns=tickers)
+        return finish_returns(factor_returns, null_threshold)
 
-        return factor_returns
\ No newline at end of file
+    def _run_batch(self, batch: list[tuple[list[str], pd.Timestamp, pd.Timestamp, Future]]) -> None:
+        """Runs one query covering every call in the batch and hands the result to each of them"""
+        try:
+            # an empty factor list means every factor, so it widens the whole batch
+            if all(tickers for tickers, _, _, _ in batch):
+                tickers = list(dict.fromkeys(ticker for tickers, _, _, _ in batch for ticker in tickers))
+            else:
+                tickers = []
+            beginning_date = min(start for _, start, _, _ in batch).date()
+            end_date = max(end for _, _, end, _ in batch).date()
+            with self.connection() as db:
+                factor_returns = DatabaseMDP(db).get_wide_returns(tickers, beginning_date, end_date)
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+        for _, _, _, future in batch:
+            future.set_result(factor_returns)
\ No newline at end of file
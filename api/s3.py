@@ -1,36 +1,68 @@
 import boto3
-from typing import Optional, BinaryIO, Union
+from boto3.s3.transfer import TransferConfig
+from typing import Optional, BinaryIO, Iterator, Union
+from botocore.config import Config
 from botocore.exceptions import ClientError
-import json
+from botocore.response import StreamingBody
+import orjson
 import pandas as pd
 import io
 
+MB = 1024 * 1024
+
 class AWSS3():
     """
     Lightweight class for interacting with AWS S3.
     """
 
-    def __init__(self, aws_access_key_id: str, aws_secret_access_key: str, bucket_name: str, region: Optional[str] = 'us-east-1') -> None:
+    def __init__(self, aws_access_key_id: str, aws_secret_access_key: str, bucket_name: str, region: Optional[str] = 'us-east-1', max_pool_connections: Optional[int] = 32) -> None:
         """
         Initializes a connection to AWS S3.
         :param aws_access_key_id: AWS access key ID
         :param aws_secret_access_key: AWS secret access key
         :param bucket_name: Name of the S3 bucket
         :param region: AWS region (defaults to us-east-1)
+        :param max_pool_connections: maximum number of HTTP connections the client keeps open, i.e. how many threads can share it concurrently
         """
         self.s3 = boto3.client(
             's3',
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
-            region_name=region
+            region_name=region,
+            # adaptive retries back off client-side when S3 throttles; keepalive stops idle pooled sockets being dropped
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={'max_attempts': 10, 'mode': 'adaptive'},
+                tcp_keepalive=True
+            )
         )
         self.bucket = bucket_name
+        # managed transfers split anything over 8 MB into 16 MB parts moved by up to 32 threads
+        self.transfer_config = TransferConfig(
+            multipart_threshold=8 * MB,
+            multipart_chunksize=16 * MB,
+            max_concurrency=32,
+            io_chunksize=1 * MB,
+            use_threads=True
+        )
         self.__test_connection()
 
+    def __enter__(self) -> 'AWSS3':
+        """Returns the S3 wrapper for use in a with-block"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Closes the S3 client when the with-block exits"""
+        self.close()
+
+    def close(self) -> None:
+        """Closes the underlying client's HTTP connections"""
+        self.s3.close()
+
     def __test_connection(self) -> None:
-        """Tests the connection to S3 by listing the bucket contents"""
+        """Tests the connection to S3 with a HeadBucket request, without listing any objects"""
         try:
-            self.s3.list_objects_v2(Bucket=self.bucket, MaxKeys=1)
+            self.s3.head_bucket(Bucket=self.bucket)
             print(f'Connected to S3 bucket: {self.bucket}')
         except ClientError as e:
             raise Exception(f'Failed to connect to S3: {str(e)}')
@@ -47,46 +79,64 @@ class AWSS3():
         """Generates the S3 URI for a given key"""
         return f"s3://{self.bucket}/{s3_key}"
 
-    def upload_file(self, file_path: str, s3_key: str) -> Optional[str]:
+    def upload_file(self, file_path: str, s3_key: str, config: Optional[TransferConfig] = None) -> Optional[str]:
         """
         Uploads a file to S3
         :param file_path: Local path to the file
         :param s3_key: Destination path in S3
+        :param config: Optional transfer settings overriding the client's defaults
         :return: S3 URI if successful, None otherwise
         """
         try:
-            self.s3.upload_file(file_path, self.bucket, s3_key)
+            self.s3.upload_file(file_path, self.bucket, s3_key, Config=config or self.transfer_config)
             return self.get_s3_uri(s3_key)
         except ClientError as e:
             print(f'Error uploading file: {str(e)}')
             return None
 
-    def upload_fileobj(self, file_obj: BinaryIO, s3_key: str) -> Optional[str]:
+    def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, config: Optional[TransferConfig] = None) -> Optional[str]:
         """
         Uploads a file-like object to S3
         :param file_obj: File-like object to upload
         :param s3_key: Destination path in S3
+        :param config: Optional transfer settings overriding the client's defaults
         :return: S3 URI if successful, None otherwise
         """
         try:
             # Reset file pointer to beginning
             file_obj.seek(0)
             # Upload the file object
-            self.s3.upload_fileobj(file_obj, self.bucket, s3_key)
+            self.s3.upload_fileobj(file_obj, self.bucket, s3_key, Config=config or self.transfer_config)
             return self.get_s3_uri(s3_key)
         except ClientError as e:
             print(f'Error uploading file object: {str(e)}')
             return None
 
-    def download_file(self, s3_key: str, local_path: str) -> bool:
+    def put_bytes(self, data: bytes, s3_key: str, metadata: Optional[dict[str, str]] = None) -> Optional[str]:
+        """
+        Uploads an in-memory payload to S3 with a single PUT (no file wrapper or transfer manager)
+        :param data: Bytes to upload
+        :param s3_key: Destination path in S3
+        :param metadata: Optional user metadata stored with the object
+        :return: S3 URI if successful, None otherwise
+        """
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=s3_key, Body=data, Metadata=metadata or {})
+            return self.get_s3_uri(s3_key)
+        except ClientError as e:
+            print(f'Error uploading bytes: {str(e)}')
+            return None
+
+    def download_file(self, s3_key: str, local_path: str, config: Optional[TransferConfig] = None) -> bool:
         """
         Downloads a file from S3
         :param s3_key: Path of the file in S3
         :param local_path: Local destination path
+        :param config: Optional transfer settings overriding the client's defaults
         :return: True if successful, False otherwise
         """
         try:
-            self.s3.download_file(self.bucket, s3_key, local_path)
+            self.s3.download_file(self.bucket, s3_key, local_path, Config=config or self.transfer_config)
             return True
         except ClientError as e:
             print(f'Error downloading file: {str(e)}')
@@ -100,25 +150,62 @@ class AWSS3():
         """
         try:
             response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
-            content = response['Body'].read().decode('utf-8')
-            return json.loads(content)
+            # orjson parses the UTF-8 bytes directly, with no decode into an intermediate str
+            return orjson.loads(response['Body'].read())
         except ClientError as e:
             print(f'Error reading JSON: {str(e)}')
             return None
 
-    def read_csv(self, s3_key: str) -> Optional[pd.DataFrame]:
+    def write_json(self, obj: Union[dict, list], s3_key: str) -> Optional[str]:
+        """
+        Writes an object to S3 as JSON
+        :param obj: JSON-serializable object (numpy arrays and scalars are supported)
+        :param s3_key: Destination path in S3
+        :return: S3 URI if successful, None otherwise
+        """
+        return self.put_bytes(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), s3_key)
+
+    def read_csv(self, s3_key: str, chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame], None]:
         """
-        Reads a CSV file from S3 into a pandas DataFrame
+        Reads a CSV file from S3 into a pandas DataFrame, parsing it as it streams in rather than buffering it first
         :param s3_key: Path of the CSV file in S3
-        :return: pandas DataFrame or None if error
+        :param chunksize: Optional number of rows per DataFrame, to iterate over very large files in pieces
+        :return: pandas DataFrame (or an iterator of them if chunksize is given) or None if error
         """
         try:
             response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
-            return pd.read_csv(io.BytesIO(response['Body'].read()))
+            return pd.read_csv(response['Body'], chunksize=chunksize)
         except ClientError as e:
             print(f'Error reading CSV: {str(e)}')
             return None
 
+    def read_parquet(self, s3_key: str) -> Optional[tuple[pd.DataFrame, dict[str, str]]]:
+        """
+        Reads a Parquet file from S3 into a pandas DataFrame
+        :param s3_key: Path of the Parquet file in S3
+        :return: pandas DataFrame and the object's user metadata, or None if error (including a missing key)
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
+            return pd.read_parquet(io.BytesIO(response['Body'].read())), response.get('Metadata', {})
+        except ClientError as e:
+            # a missing key is an expected cache miss, so only report real errors
+            if e.response.get('Error', {}).get('Code') != 'NoSuchKey':
+                print(f'Error reading Parquet: {str(e)}')
+            return None
+
+    def upload_parquet(self, df: pd.DataFrame, s3_key: str, metadata: Optional[dict[str, str]] = None) -> Optional[str]:
+        """
+        Uploads a pandas DataFrame to S3 as snappy-compressed Parquet
+        :param df: pandas DataFrame to upload
+        :param s3_key: Destination path in S3
+        :param metadata: Optional user metadata stored with the object
+        :return: S3 URI if successful, None otherwise
+        """
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, compression='snappy')
+        return self.put_bytes(buffer.getvalue(), s3_key, metadata)
+
     def delete_file(self, s3_key: str) -> bool:
         """
         Deletes a file from S3
@@ -132,44 +219,41 @@ class AWSS3():
             print(f'Error deleting file: {str(e)}')
             return False
 
-    def list_files(self, prefix: str = '') -> list:
+    def list_files(self, prefix: str = '') -> Iterator[str]:
         """
-        Lists files in the S3 bucket
+        Lists files in the S3 bucket, following pagination past the 1000-key page limit.
+        Keys are yielded lazily, one page (round-trip) at a time; wrap in list() if a list is needed
         :param prefix: Optional prefix to filter results
-        :return: List of file keys
+        :return: Iterator of file keys
         """
         try:
-            response = self.s3.list_objects_v2(Bucket=self.bucket, Prefix=prefix)
-            if 'Contents' in response:
-                return [obj['Key'] for obj in response['Contents']]
-            return []
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for obj in page.get('Contents', ()):
+                    yield obj['Key']
         except ClientError as e:
             print(f'Error listing files: {str(e)}')
-            return []
 
     def upload_dataframe(self, df: pd.DataFrame, s3_key: str) -> Optional[str]:
         """
-        Uploads a pandas DataFrame directly to S3 as CSV
+        Uploads a pandas DataFrame to S3 as snappy-compressed Parquet through the managed (multipart) transfer.
+        Parquet keeps dtypes and is far smaller than CSV for numeric data; use upload_parquet for small frames
         :param df: pandas DataFrame to upload
-        :param s3_key: Destination path in S3
+        :param s3_key: Destination path in S3 (conventionally ending in .parquet)
         :return: S3 URI if successful, None otherwise
         """
         try:
-            # Convert DataFrame to CSV buffer in memory
-            csv_buffer = io.StringIO()
-            df.to_csv(csv_buffer, index=False)
-            
-            # Convert to bytes buffer
-            csv_bytes = io.BytesIO(csv_buffer.getvalue().encode())
+            # Serialize straight to bytes in memory (no intermediate str copy)
+            parquet_buffer = io.BytesIO()
+            df.to_parquet(parquet_buffer, engine='pyarrow', compression='snappy')
+            parquet_buffer.seek(0)
             
             # Upload to S3
-            self.s3.upload_fileobj(csv_bytes, self.bucket, s3_key)
+            self.s3.upload_fileobj(parquet_buffer, self.bucket, s3_key, Config=self.transfer_config)
             return self.get_s3_uri(s3_key)
         except ClientError as e:
             print(f'Error uploading DataFrame: {str(e)}')
             return None
-        finally:
-            csv_buffer.close()
 
     def download_fileobj(self, s3_key: str) -> Optional[io.BytesIO]:
         """
@@ -183,3 +267,16 @@ class AWSS3():
         except ClientError as e:
             print(f'Error downloading file: {str(e)}')
             return None
+
+    def get_streaming_body(self, s3_key: str) -> Optional[StreamingBody]:
+        """
+        Opens a file in S3 for streaming without reading it into memory
+        :param s3_key: Path of the file in S3
+        :return: botocore StreamingBody to read the file from, or None if error
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=s3_key)
+            return response['Body']
+        except ClientError as e:
+            print(f'Error opening file stream: {str(e)}')
+            return None
@@ -14,6 +14,10 @@ class Account(BaseModel):
     password_hash: str = Field(..., min_length=1)  # must be non-empty
     created_at: Union[str, datetime.datetime] = Field(default_factory=datetime.datetime.now)
 
+class Credentials(BaseModel):  # login/signup request body, so passwords stay out of URLs and access logs
+    username: str
+    password: str
+
 class Portfolio(BaseModel):
     portfolio_id: Optional[str] = Field(None, min_length=1)  # uuid, can be generated by the database
     portfolio_name: str = Field(..., min_length=1)  # the name the user gives for the portfolio, required
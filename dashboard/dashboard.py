@@ -1,46 +1,90 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
 from typing import Optional
 import os
 import io
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from common.models import Portfolio, PortfolioHolding, Factor
-from pydantic import ValidationError, fields
+from pydantic import BaseModel, TypeAdapter, ValidationError, fields
 import pandas as pd
+import altair as alt
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 
 # Backend URL from environment variable with fallback
 BACKEND_URL = os.getenv("BACKEND_URL", "http://api:8000")
+# Endpoint URLs, built once since the backend URL is fixed for the process
+PORTFOLIOS_URL = f"{BACKEND_URL}/portfolios"
+HOLDINGS_URL = f"{BACKEND_URL}/portfolio/holdings"
+USER_HOLDINGS_URL = f"{BACKEND_URL}/portfolios/holdings"
+FACTORS_URL = f"{BACKEND_URL}/factors"
+VALIDATE_FACTOR_MODEL_URL = f"{BACKEND_URL}/analysis/validate_factor_model"
+FACTOR_MODEL_URL = f"{BACKEND_URL}/analysis/factor_model"
+LOGIN_URL = f"{BACKEND_URL}/login"
+ACCOUNT_URL = f"{BACKEND_URL}/account"
+PORTFOLIO_URL = f"{BACKEND_URL}/portfolio"
+TEMPLATE_PORTFOLIO_URL = f"{BACKEND_URL}/download/portfolios/template_portfolio.csv"
+# Timeouts (seconds) for backend calls: connecting is quick on the compose network, analysis fits can take a while
+CONNECT_TIMEOUT = 1.0
+READ_TIMEOUT = 5.0
+UPLOAD_READ_TIMEOUT = 10.0
+ANALYSIS_READ_TIMEOUT = 25.0
+# Fully validate backend payloads (development); otherwise the API's already-validated rows are trusted
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true")
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))  # no-op on reruns once the root logger has a handler
+logger = logging.getLogger("labfolio.dashboard")
 
 # Configure page settings
 st.set_page_config(page_title="labfolio", layout="wide")
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    One keep-alive HTTP session for all backend calls. Streamlit re-executes this script on every interaction,
+    so the session is held in the resource cache rather than a module global to survive reruns.
+    Idempotent requests are retried briefly when the backend is restarting behind a proxy
+    """
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+SESSION = get_http_session()
+
 #####################
 ### SESSION STATE ###
 #####################
 
-if 'authenticated' not in st.session_state:
-    st.session_state.authenticated = False
-if 'username' not in st.session_state:
-    st.session_state.username = None
-if 'user_id' not in st.session_state:
-    st.session_state.user_id = None
-if 'is_create_account' not in st.session_state:
-    st.session_state.is_create_account = False
-if 'selected_portfolio_id' not in st.session_state:
-    st.session_state.selected_portfolio_id = None
-if 'portfolios_table' not in st.session_state:
-    st.session_state.portfolios_table = None
-if 'factor_selection' not in st.session_state:
-    st.session_state.factor_selection = None
-if 'analysis_running' not in st.session_state:
-    st.session_state.analysis_running = False
-if 'selected_factors' not in st.session_state:
-    st.session_state.selected_factors = []
-if 'analysis_results' not in st.session_state:
-    st.session_state.analysis_results = None
+SESSION_DEFAULTS = {
+    'authenticated': False,
+    'username': None,
+    'user_id': None,
+    'is_create_account': False,
+    'selected_portfolio_id': None,
+    'portfolios_table': None,
+    'factor_selection': None,
+    'analysis_running': False,
+    'selected_factors': [],
+    'analysis_results': None,
+    'analysis_frames': None,  # tables built from analysis_results once, when they arrive
+    'holdings_cache': None,  # (portfolio_id, holdings) for the current selection
+}
+for key, default in SESSION_DEFAULTS.items():
+    if key not in st.session_state:
+        # copied so sessions never share a mutable default
+        st.session_state[key] = copy.copy(default)
 
 ##############################
 ### BACKEND HELPER METHODS ###
@@ -50,111 +94,279 @@ if 'analysis_results' not in st.session_state:
 ### GET REQUESTS ###
 ####################
 
-def get_user_portfolios() -> list[Portfolio]:
+def api_request(method: str, url: str, read_timeout: float = READ_TIMEOUT, **kwargs) -> requests.Response:
+    """
+    Sends a request to the backend over the shared session. The connect timeout is short and the same for every call,
+    so an unreachable backend fails fast; the read timeout is per endpoint
+    """
+    return SESSION.request(method, url, timeout=(CONNECT_TIMEOUT, read_timeout), **kwargs)
+
+def report_request_error(e: Exception) -> None:
+    """Shows the user-facing message for a failed backend request"""
+    if isinstance(e, requests.exceptions.Timeout):
+        st.error("Request timed out. Please try again.")
+    elif isinstance(e, requests.exceptions.ConnectionError):
+        st.error("Could not connect to the server. Please try again later.")
+    else:
+        st.error(f"An unexpected error occurred: {str(e)}")
+
+# near-static backend data is cached across reruns; only successful responses are cached since failures raise
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_user_portfolios(user_id: str) -> list[dict]:
+    """Raw portfolio rows for a user. Cleared after a successful upload"""
+    response = api_request(
+        "GET",
+        PORTFOLIOS_URL,
+        params={"user_id": user_id}
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_user_holdings(user_id: str) -> dict[str, list[dict]]:
+    """Raw holdings rows of every portfolio a user can see, keyed by portfolio_id. Cleared after a successful upload"""
+    response = api_request(
+        "GET",
+        USER_HOLDINGS_URL,
+        params={"user_id": user_id}
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_portfolio_holdings(portfolio_id: str) -> list[dict]:
+    """Raw holdings rows for a portfolio"""
+    response = api_request(
+        "GET",
+        HOLDINGS_URL,
+        params={"portfolio_id": portfolio_id}
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_factors(user_id: str) -> list[dict]:
+    """Raw factor library rows"""
+    response = api_request(
+        "GET",
+        FACTORS_URL,
+        params={"user_id": user_id}
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+# list validators are compiled once and validate a whole payload in one pass
+LIST_ADAPTERS = {model: TypeAdapter(list[model]) for model in (Portfolio, PortfolioHolding, Factor)}
+
+def build_models(model: type[BaseModel], rows: list[dict], label: str) -> list[BaseModel]:
+    """
+    Builds models from backend rows, skipping validation unless DEBUG is set. Under DEBUG the list is validated
+    in one call; every invalid row is reported together and the valid rows are kept
     """
-    Get all portfolios for the current user
+    if not DEBUG:
+        return [model.model_construct(**row) for row in rows]
+    adapter = LIST_ADAPTERS[model]
+    try:
+        return adapter.validate_python(rows)
+    except ValidationError as e:
+        st.error(f"Invalid {label} data received: {str(e)}")
+        invalid = {error['loc'][0] for error in e.errors()}
+        return adapter.validate_python([row for i, row in enumerate(rows) if i not in invalid])
+
+def _error_detail(response: requests.Response) -> str:
+    """The API's error detail from a failed response, parsing the body once and falling back to its text"""
+    if response.headers.get("content-type", "").startswith("application/json"):
+        try:
+            return orjson.loads(response.content).get("detail", "Unknown error occurred")
+        except (orjson.JSONDecodeError, AttributeError):
+            pass
+    return response.text or "Unknown error occurred"
+
+def get_user_portfolios(user_id: str) -> list[Portfolio]:
+    """
+    Get all portfolios for the given user
     Returns a list of validated Portfolio objects
     """
     try:
         # Verify user is authenticated and we have their user_id
-        if not st.session_state.authenticated or not st.session_state.user_id:
+        if not st.session_state.authenticated or not user_id:
             st.error("You must be logged in to view portfolios.")
             return []
             
-        # Make the request to the API
-        response = requests.get(
-            f"{BACKEND_URL}/portfolios",
-            params={"user_id": st.session_state.user_id},
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            portfolios = []
-            for portfolio_data in response.json():
-                try:
-                    # Ensure portfolio_id is converted to string
-                    portfolio = Portfolio.model_validate(portfolio_data)
-                    portfolios.append(portfolio)
-                except ValidationError as e:
-                    st.error(f"Invalid portfolio data received: {str(e)}")
-            return portfolios
-        else:
-            error_detail = response.json().get("detail", "Unknown error occurred")
-            st.error(f"Failed to fetch portfolios: {error_detail}")
-            return []
+        return build_models(Portfolio, _fetch_user_portfolios(user_id), "portfolio")
             
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return []
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Failed to fetch portfolios: {_error_detail(e.response)}")
         return []
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
         return []
 
 # TODO: Implement get_portfolio
 def get_portfolio_holdings(portfolio_id: str) -> list[PortfolioHolding]:
     """Method to get a single portfolio by its ID from the backend."""
     try:
-        response = requests.get(
-            f"{BACKEND_URL}/portfolio/holdings",
-            params={"portfolio_id": portfolio_id},
-            timeout=5
-        )
-        if response.status_code == 200:
-            holdings = []
-            for holding_data in response.json():
-                try:
-                    holding = PortfolioHolding.model_validate(holding_data)
-                    holdings.append(holding)
-                except ValidationError as e:
-                    st.error(f"Invalid holding data received: {str(e)}")
-            return holdings
-        else:
-            error_detail = response.json().get("detail", "Unknown error occurred")
-            st.error(f"Failed to fetch holdings: {error_detail}")
-            return []
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return []
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
+        # one batched call covers all of the user's portfolios; one the batch had to leave out is fetched on its own
+        rows = _fetch_user_holdings(st.session_state.user_id).get(portfolio_id)
+        if rows is None:
+            rows = _fetch_portfolio_holdings(portfolio_id)
+        return build_models(PortfolioHolding, rows, "holding")
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Failed to fetch holdings: {_error_detail(e.response)}")
         return []
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
         return []
 
-def get_factors() -> list[Factor]:
+def get_factors(user_id: str) -> list[Factor]:
     try:
-        response = requests.get(
-            f"{BACKEND_URL}/factors",
-            params={"user_id": st.session_state.user_id},
-            timeout=5
-        )
-        if response.status_code == 200:
-            factors = []
-            for factor_data in response.json():
-                try:
-                    factor = Factor.model_validate(factor_data)
-                    factors.append(factor)
-                except ValidationError as e:
-                    st.error(f"Invalid factor data received: {str(e)}")
-            return factors
-        else:
-            error_detail = response.json().get("detail", "Unknown error occurred")
-            st.error(f"Failed to fetch factors: {error_detail}")
-            return []
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return []
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
+        return build_models(Factor, _fetch_factors(user_id), "factor")
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Failed to fetch factors: {_error_detail(e.response)}")
         return []
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
         return []
 
+def selected_holdings() -> list[PortfolioHolding]:
+    """Holdings for the selected portfolio, from the session memo when it matches the selection"""
+    portfolio_id = st.session_state.selected_portfolio_id
+    cache = st.session_state.holdings_cache
+    if cache and cache[0] == portfolio_id:
+        return cache[1]
+    return get_portfolio_holdings(portfolio_id)
+
+def fetch_all() -> tuple[list[Portfolio], list[PortfolioHolding], list[Factor]]:
+    """
+    Fetches the user's portfolios, the selected portfolio's holdings and the factor library concurrently,
+    so a rerun waits for the slowest call instead of the sum of all of them. Each getter handles its own
+    errors; the worker threads are attached to this run's script context so st.error and session state work
+    """
+    ctx = get_script_run_ctx()
+    def run(getter, *args):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return getter(*args)
+
+    user_id = st.session_state.user_id
+    portfolio_id = st.session_state.selected_portfolio_id
+    # holdings only need fetching when the selection changes, not on every unrelated rerun
+    cache = st.session_state.holdings_cache
+    cached_holdings = cache[1] if cache and cache[0] == portfolio_id else None
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        portfolios = executor.submit(run, get_user_portfolios, user_id)
+        holdings = None
+        if portfolio_id and cached_holdings is None:
+            holdings = executor.submit(run, get_portfolio_holdings, portfolio_id)
+        factors = executor.submit(run, get_factors, user_id)
+        portfolios, factors = portfolios.result(), factors.result()
+
+    if holdings is not None:
+        holdings = holdings.result()
+        # a failed fetch comes back empty and is retried on the next rerun
+        st.session_state.holdings_cache = (portfolio_id, holdings) if holdings else None
+    elif portfolio_id:
+        holdings = cached_holdings
+    else:
+        holdings = []
+    return portfolios, holdings, factors
+
+##############
+### TABLES ###
+##############
+
+def portfolios_frame(portfolios: list[Portfolio]) -> pd.DataFrame:
+    """
+    Portfolio table, built straight from the models without an intermediate list of dicts.
+    Ids are not displayed, so they are left out; rows line up with the portfolios list for selection lookups
+    """
+    return pd.DataFrame.from_records(
+        ((p.portfolio_name, p.created_at) for p in portfolios),
+        columns=["Portfolio Name", "Created At"]
+    )
+
+def holdings_frame(holdings: list[PortfolioHolding]) -> pd.DataFrame:
+    """Holdings table for a portfolio, built column-wise with Arrow-backed tickers so they serialize without conversion"""
+    return pd.DataFrame({
+        "Ticker": pd.array([h.yf_ticker for h in holdings], dtype="string[pyarrow]"),
+        "Quantity": np.fromiter((h.quantity for h in holdings), dtype=np.int64, count=len(holdings))
+    })
+
+def factors_frame(factors: list[Factor], detailed: bool = False) -> pd.DataFrame:
+    """
+    Factor table; the detailed form adds the description and last update for the library tab.
+    Category only takes a handful of values, so it is categorical and goes to Arrow dictionary-encoded
+    """
+    if detailed:
+        frame = pd.DataFrame.from_records(
+            ((f.factor_id, f.factor_name, f.factor_description, f.factor_category, f.last_updated) for f in factors),
+            columns=["Factor ID", "Factor Name", "Description", "Category", "Last Updated"]
+        )
+    else:
+        frame = pd.DataFrame.from_records(
+            ((f.factor_id, f.factor_name, f.factor_category) for f in factors),
+            columns=["Factor ID", "Factor Name", "Category"]
+        )
+    return frame.astype({"Category": "category"})
+
+##############
+### CHARTS ###
+##############
+
+# analysis results only change when an analysis is run, so each matplotlib chart is rendered to PNG once per result
+# and later reruns just resend the cached image instead of redrawing
+
+def figure_png(fig) -> bytes:
+    """Renders a figure to PNG bytes the way st.pyplot does, then closes it"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def betas_chart(params: pd.DataFrame) -> bytes:
+    """Horizontal bars of each asset's factor betas"""
+    fig, ax = plt.subplots(figsize=(10, 8))
+    params.plot.barh(ax=ax)
+    sns.despine(ax=ax)
+    fig.tight_layout()
+    return figure_png(fig)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def covariance_chart(cov_matrix: pd.DataFrame) -> bytes:
+    """Heatmap of the factor covariance matrix"""
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.heatmap(
+        cov_matrix,
+        annot=False,
+        cmap='coolwarm',
+        center=0,
+        fmt='.2e',
+        ax=ax
+    )
+    ax.set_title('Factor Covariance Matrix')
+    
+    # Rotate x-axis labels for better readability
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    plt.setp(ax.get_yticklabels(), rotation=0)
+    
+    # Adjust layout to prevent label cutoff
+    fig.tight_layout()
+    return figure_png(fig)
+
+def build_analysis_frames(analysis: dict) -> dict:
+    """Builds the tables the analysis section renders from the API's analysis payload"""
+    params = pd.DataFrame.from_dict(analysis['params'])
+    # equal-weighted betas as a plain matmul on the factor columns (alpha excluded), labelled afterwards
+    n_assets = analysis['statistics']['no_assets']
+    equal_weights = np.full(n_assets, 1.0 / n_assets)
+    factor_columns = [c for c in params.columns if c != 'alpha']
+    return {
+        "params": params,
+        "portfolio_betas": pd.Series(params[factor_columns].to_numpy().T @ equal_weights, index=factor_columns),
+        "risk_premia": pd.DataFrame.from_dict(analysis['risk_premia'], orient='index', columns=['Mean Annualized Return']),
+        "cov_matrix": pd.DataFrame.from_dict(analysis['covariance_matrix'])
+    }
+
 def validate_factor_model():
     """
     Validates the factor model using selected factors and holdings from session state
@@ -171,8 +383,8 @@ def validate_factor_model():
             st.warning("Please select at least one factor")
             return
             
-        # Now get holdings since we know we have a portfolio_id
-        holdings = get_portfolio_holdings(st.session_state.selected_portfolio_id)
+        # Now get holdings since we know we have a portfolio_id (usually already loaded by this run's fetch)
+        holdings = selected_holdings()
         if not holdings:
             st.warning("Selected portfolio has no holdings")
             return
@@ -188,17 +400,17 @@ def validate_factor_model():
         ]
         
         # Make POST request to API endpoint
-        response = requests.post(
-            f"{BACKEND_URL}/analysis/validate_factor_model",
+        response = api_request(
+            "POST",
+            VALIDATE_FACTOR_MODEL_URL,
             json={
                 "factors": factors,
                 "holdings": portfolio_holdings
-            },
-            timeout=5
+            }
         )
             
         if response.status_code == 200:
-            if response.json():
+            if orjson.loads(response.content):
                 st.success("Factor model is valid!")
             else:
                 st.warning("Factor model is not valid.")
@@ -224,8 +436,8 @@ def run_factor_analysis() -> None:
             st.warning("Please select at least one factor")
             return
             
-        # Now get holdings since we know we have a portfolio_id
-        holdings = get_portfolio_holdings(st.session_state.selected_portfolio_id)
+        # Now get holdings since we know we have a portfolio_id (usually already loaded by this run's fetch)
+        holdings = selected_holdings()
         if not holdings:
             st.warning("Selected portfolio has no holdings")
             return
@@ -244,18 +456,20 @@ def run_factor_analysis() -> None:
         st.session_state.analysis_running = True
         
         # Make POST request to API endpoint
-        response = requests.post(
-            f"{BACKEND_URL}/analysis/factor_model",
+        response = api_request(
+            "POST",
+            FACTOR_MODEL_URL,
             json={
                 "factors": factors,
                 "holdings": portfolio_holdings
             },
-            timeout=25
+            read_timeout=ANALYSIS_READ_TIMEOUT
         )
             
         if response.status_code == 200:
             # Store analysis results in session state
-            st.session_state.analysis_results = response.json()
+            st.session_state.analysis_results = orjson.loads(response.content)
+            st.session_state.analysis_frames = build_analysis_frames(st.session_state.analysis_results['analysis'])
             st.success("Factor analysis completed successfully!")
         else:
             st.error(f"Error running factor analysis: {response.text}")
@@ -270,19 +484,34 @@ def run_factor_analysis() -> None:
 ### POST REQUESTS ###
 #####################
 
+def prefetch_user_data(user_id: str) -> None:
+    """
+    Warms the portfolio, holdings and factor caches in the background right after authentication,
+    so the first authenticated rerun finds them already fetched instead of waiting on the backend
+    """
+    def warm():
+        for fetch in (_fetch_user_portfolios, _fetch_user_holdings, _fetch_factors):
+            try:
+                fetch(user_id)
+            except Exception:
+                pass  # nothing is cached on failure; the getters report the error on the rerun
+
+    threading.Thread(target=warm, daemon=True).start()
+
 def login(username: str, password: str) -> bool:
     """Attempt to login user via API"""
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/login",
-            params={"username": username, "password": password},
-            timeout=5
+        response = api_request(
+            "POST",
+            LOGIN_URL,
+            json={"username": username, "password": password}
         )
         if response.status_code == 200:
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             st.session_state.authenticated = True
             st.session_state.username = response_data["username"]
             st.session_state.user_id = response_data["user_id"]
+            prefetch_user_data(response_data["user_id"])
             return True
         elif response.status_code == 401:
             st.error("Invalid username or password.")
@@ -297,34 +526,29 @@ def login(username: str, password: str) -> bool:
 def create_account(username: str, password: str) -> bool:
     """Attempt to create a new user account via API"""
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/account",
-            params={"username": username, "password": password},
-            timeout=5
+        response = api_request(
+            "POST",
+            ACCOUNT_URL,
+            json={"username": username, "password": password}
         )
 
         if response.status_code == 200:  # Created successfully
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             st.session_state.authenticated = True
             st.session_state.username = response_data["username"]
             st.session_state.user_id = response_data["user_id"]
+            prefetch_user_data(response_data["user_id"])
             return True
         elif response.status_code == 400:  # Username already exists
             st.error("Username already exists. Please choose a different username.")
             return False
         else:  # Other errors (500, etc)
-            error_detail = response.json().get("detail", "Unknown error occurred")
+            error_detail = _error_detail(response)
             st.error(f"Account creation failed: {error_detail}")
             return False
             
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return False
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
-        return False
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
         return False
 
 def upload_portfolio(file, portfolio_name: str) -> bool:
@@ -340,84 +564,69 @@ def upload_portfolio(file, portfolio_name: str) -> bool:
             st.error("You must be logged in to upload a portfolio.")
             return False
             
-        print(f"DEBUG: Starting upload for file {file.name}")
-        print(f"DEBUG: Portfolio name: {portfolio_name}")
-        print(f"DEBUG: User ID: {st.session_state.user_id}")
+        logger.debug("Uploading portfolio %r from %s for user %s", portfolio_name, file.name, st.session_state.user_id)
         
         # Seek to beginning of file
         file.seek(0)
         
-        # Create BytesIO object from file
-        file_bytes = io.BytesIO(file.read())
-        file_bytes.seek(0)
-        
-        # Create the multipart form data
-        files = {"file": (file.name, file_bytes, "text/csv")}
+        # Create the multipart form data, handing requests the uploaded file directly rather than a copy
+        files = {"file": (file.name, file, "text/csv")}
         params = {
             "portfolio_name": portfolio_name,
             "user_id": st.session_state.user_id
         }
         
-        print("DEBUG: Sending request to API")
         # Make the request to the API
-        response = requests.post(
-            f"{BACKEND_URL}/portfolio",
+        response = api_request(
+            "POST",
+            PORTFOLIO_URL,
             files=files,
             params=params,
-            timeout=10
+            read_timeout=UPLOAD_READ_TIMEOUT
         )
-        print(f"DEBUG: Received response with status code: {response.status_code}")
+        logger.debug("Upload response status: %s", response.status_code)
         
         if response.status_code == 200:
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             st.success(f"Portfolio '{response_data['portfolio_name']}' uploaded successfully!")
+            _fetch_user_portfolios.clear()
+            _fetch_user_holdings.clear()
+            st.session_state.holdings_cache = None
             return True
         elif response.status_code == 400:
-            error_detail = response.json().get("detail", "Unknown error occurred")
+            error_detail = _error_detail(response)
             st.error(f"Invalid portfolio format: {error_detail}")
             return False
         else:
-            error_detail = response.json().get("detail", "Unknown error occurred")
+            error_detail = _error_detail(response)
             st.error(f"Failed to upload portfolio: {error_detail}")
             return False
             
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-        return False
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
-        return False
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
         return False
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_portfolio_template() -> bytes:
+    """The template portfolio CSV. It rarely changes, so the tab's reruns reuse one download"""
+    response = api_request("GET", TEMPLATE_PORTFOLIO_URL)
+    response.raise_for_status()
+    return response.content
+
 def download_portfolio_template() -> None:
     """Downloads the template portfolio file from S3"""
     try:
-        response = requests.get(
-            f"{BACKEND_URL}/download/portfolios/template_portfolio.csv",
-            timeout=5,
-            stream=True
+        # Trigger browser download
+        st.download_button(
+            label="Download Template Portfolio",
+            data=_fetch_portfolio_template(),
+            file_name="template_portfolio.csv",
+            mime="text/csv"
         )
-        
-        if response.status_code == 200:
-            # Trigger browser download
-            st.download_button(
-                label="Download Template Portfolio",
-                data=response.content,
-                file_name="template_portfolio.csv",
-                mime="text/csv"
-            )
-        else:
-            error_detail = response.json().get("detail", "Unknown error occurred")
-            st.error(f"Failed to download template: {error_detail}")
-            
-    except requests.exceptions.Timeout:
-        st.error("Request timed out. Please try again.")
-    except requests.exceptions.ConnectionError:
-        st.error("Could not connect to the server. Please try again later.")
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Failed to download template: {_error_detail(e.response)}")
     except Exception as e:
-        st.error(f"An unexpected error occurred: {str(e)}")
+        report_request_error(e)
 
 #########################
 ### UI HELPER METHODS ###
@@ -477,6 +686,9 @@ if not st.session_state.is_create_account:
 else:
     st.subheader(f"Welcome, {st.session_state.username}.")
 
+# every tab renders from one concurrent fetch rather than calling the getters inline
+portfolios, holdings, factors = fetch_all()
+
 tabs = st.tabs(["Portfolio Analysis", "My Portfolios", "Factor Library"])
 
 # Portfolio Analysis tab
@@ -489,17 +701,9 @@ with tabs[0]:
     # Left column - Factor Library
     with col1:
         st.subheader("Factor Library")
-        factors = get_factors()
         if factors:
-            # Convert factors to a more concise display format
-            factor_data = [{
-                "Factor ID": f.factor_id,
-                "Factor Name": f.factor_name,
-                "Category": f.factor_category
-            } for f in factors]
-            
-            # Create DataFrame for better formatting
-            factor_df = pd.DataFrame(factor_data)
+            # Concise display format
+            factor_df = factors_frame(factors)
             
             def handle_factor_selection():
                 """Handle selection of factors in the dataframe"""
@@ -543,10 +747,8 @@ with tabs[0]:
     with col2:
         st.subheader("Portfolio Holdings")
         if st.session_state.selected_portfolio_id:
-            holdings = get_portfolio_holdings(st.session_state.selected_portfolio_id)
             if holdings:
-                holdings_data = [{"Ticker": h.yf_ticker, "Quantity": h.quantity} for h in holdings]
-                st.dataframe(holdings_data, hide_index=True, use_container_width=True)
+                st.dataframe(holdings_frame(holdings), hide_index=True, use_container_width=True)
         else:
             st.info("Please select a portfolio from the 'My Portfolios' tab to view holdings.")
     
@@ -556,6 +758,7 @@ with tabs[0]:
     # actual analysis
     if st.session_state.analysis_results:
         st.subheader("Factor Model Analysis")
+        frames = st.session_state.analysis_frames
         
         # Display statistics
         stats = st.session_state.analysis_results['analysis']['statistics']
@@ -583,25 +786,10 @@ with tabs[0]:
         st.write("""Factor exposures are the weights of each factor in the portfolio.
         These can help you understand how much risk each factor is contributing to your portfolio.""")
 
-        n_assets = stats['no_assets']
-        equal_weights = np.repeat(1/n_assets, n_assets)
-        params = st.session_state.analysis_results['analysis']['params']
-        params = pd.DataFrame.from_dict(params)
-        betas = params.copy()
-        if 'alpha' in betas.columns:
-            portfolio_betas = betas.drop('alpha', axis=1).T @ equal_weights
-        else:
-            portfolio_betas = betas.T @ equal_weights
-
-        fig, ax = plt.subplots()
-        portfolio_betas.plot.barh(ax=ax)
-        plt.title('Portfolio Factor Exposures')
-        for i, v in enumerate(portfolio_betas):
-            ax.text(v, i, f'{v:.2f}', color='black', va='center')
-        plt.xlabel('Beta')
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
+        portfolio_betas = frames["portfolio_betas"]
+
+        # simple bar charts are drawn client-side by Streamlit; values show on hover
+        st.bar_chart(portfolio_betas.rename('Beta'), horizontal=True)
 
         st.dataframe(portfolio_betas, use_container_width=True)
 
@@ -610,14 +798,16 @@ with tabs[0]:
         st.write("""Factor risk premia are the expected returns of each factor.
         These can help you understand how much return each factor is contributing to your portfolio.""")
 
-        risk_premia = st.session_state.analysis_results['analysis']['risk_premia']
-        risk_premia = pd.DataFrame.from_dict(risk_premia, orient='index', columns=['Mean Annualized Return'])
-        fig, ax = plt.subplots(figsize=(10, 8))
-        risk_premia.sort_values(by='Mean Annualized Return', ascending=False).plot.barh(ax=ax)
-        sns.despine()
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
+        risk_premia = frames["risk_premia"]
+        # st.bar_chart orders the factor axis itself, so the highest-premium-first order needs an explicit sort
+        st.altair_chart(
+            alt.Chart(risk_premia.rename_axis('Factor').reset_index()).mark_bar().encode(
+                x='Mean Annualized Return:Q',
+                y=alt.Y('Factor:N', sort='-x'),
+                tooltip=['Factor', 'Mean Annualized Return']
+            ),
+            use_container_width=True
+        )
         st.dataframe(risk_premia, hide_index=False, use_container_width=True)
 
         # Holdings Data
@@ -625,13 +815,9 @@ with tabs[0]:
         st.write("""Granular data on the individual holdings from the portfolio factor analysis.""")
 
         st.markdown("### Individual Asset Factor Betas")
+        params = frames["params"]
         # Plot the model betas
-        fig, ax = plt.subplots(figsize=(10, 8))
-        params.plot.barh(ax=ax)
-        sns.despine()
-        plt.tight_layout()
-        st.pyplot(fig)
-        plt.close(fig)
+        st.image(betas_chart(params))
 
         st.dataframe(params, hide_index=True, use_container_width=True)
 
@@ -640,35 +826,10 @@ with tabs[0]:
         # Subtitle explaining what the covariance matrix is used for
         st.write("The covariance matrix can help in understanding how the factors are correlated with each other.")
         
-        # Convert covariance dictionary to DataFrame
-        cov_matrix = pd.DataFrame.from_dict(
-            st.session_state.analysis_results['analysis']['covariance_matrix']
-        )
-        
-        # Create the heatmap
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(
-            cov_matrix,
-            annot=False,
-            cmap='coolwarm',
-            center=0,
-            fmt='.2e',
-            ax=ax
-        )
-        plt.title('Factor Covariance Matrix')
-        
-        # Rotate x-axis labels for better readability
-        plt.xticks(rotation=45, ha='right')
-        plt.yticks(rotation=0)
-        
-        # Adjust layout to prevent label cutoff
-        plt.tight_layout()
+        cov_matrix = frames["cov_matrix"]
         
-        # Display the plot
-        st.pyplot(fig)
-        
-        # Clean up
-        plt.close(fig)
+        # Display the heatmap
+        st.image(covariance_chart(cov_matrix))
 
 # My Portfolios tab
 with tabs[1]:
@@ -702,30 +863,21 @@ with tabs[1]:
         # Add a button to clear selection
         if st.button("Clear Selection"):
             st.session_state.selected_portfolio_id = None
+            st.session_state.holdings_cache = None
             st.rerun()
         
-        # Get and display the holdings
-        holdings = get_portfolio_holdings(st.session_state.selected_portfolio_id)
+        # Display the holdings
         if holdings:
-            holdings_data = [{"Ticker": h.yf_ticker, "Quantity": h.quantity} for h in holdings]
-            st.dataframe(holdings_data, hide_index=True, use_container_width=True)
+            st.dataframe(holdings_frame(holdings), hide_index=True, use_container_width=True)
         else:
             st.info("No holdings found for this portfolio.")
 
     # Table of existing portfolios
     st.subheader("Your Existing Portfolios")
-    portfolios = get_user_portfolios()
     
     if portfolios:
-        # Create a list of dictionaries with portfolio data
-        portfolio_data = [{
-            "Portfolio ID": p.portfolio_id,
-            "Portfolio Name": p.portfolio_name,
-            "Created At": p.created_at
-        } for p in portfolios]
-        
-        # Create a DataFrame for better formatting
-        portfolio_df = pd.DataFrame(portfolio_data)
+        portfolio_df = portfolios_frame(portfolios)
+        portfolio_ids = [p.portfolio_id for p in portfolios]
 
         def handle_portfolio_selection():
             """Handle selection of portfolios in the dataframe"""
@@ -738,13 +890,11 @@ with tabs[1]:
                 return
             
             # Process selection if a row is selected
-            row_number = table['selection']['rows'][0]
-            row = portfolio_df.iloc[row_number]
-            st.session_state.selected_portfolio_id = row['Portfolio ID']
+            st.session_state.selected_portfolio_id = portfolio_ids[table['selection']['rows'][0]]
 
-        # Display interactive dataframe with hidden Portfolio ID column
+        # Display interactive dataframe; ids are looked up by row number
         selected_rows = st.dataframe(
-            portfolio_df[["Portfolio Name", "Created At"]],  # Only show these columns
+            portfolio_df,
             hide_index=True,
             use_container_width=True,
             height=300,
@@ -765,20 +915,8 @@ with tabs[2]:
     All factors quoted on labfolio source return data from publicly-traded, highly liquid ETFs. The implication is that factor quality is lower but hedging recommendations are actually implementable.
     Below is a list of all factors currently available for portfolio analysis on labfolio.
     """)
-    factors = get_factors()
     if factors:
-        # Convert factors to a list of dictionaries, excluding created_at
-        factor_data = []
-        for factor in factors:
-            factor_dict = {
-                "Factor ID": factor.factor_id,
-                "Factor Name": factor.factor_name,
-                "Description": factor.factor_description,
-                "Category": factor.factor_category,
-                "Last Updated": factor.last_updated
-            }
-            factor_data.append(factor_dict)
-        # Display the scrollable table without index and full width
-        st.dataframe(factor_data, hide_index=True, use_container_width=True)
+        # Display the scrollable table (excluding created_at) without index and full width
+        st.dataframe(factors_frame(factors, detailed=True), hide_index=True, use_container_width=True)
     else:
         st.info("No factors found in the library.")
\ No newline at end of file
@@ -1,64 +1,140 @@
 import os
 import yfinance as yf
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import psycopg2
-from datetime import datetime, timedelta
-import pandas as pd
-import gc
+from datetime import date, timedelta
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import io
 
-# helper function to get a database connection
+# yfinance downloads are network-bound, so they are fetched concurrently
+FETCH_MAX_WORKERS = 16
+
+# one pooled HTTP session for every Ticker, sized so each download thread keeps its own keep-alive connection
+# to Yahoo (the default pool of 10 would discard connections under 16 threads). Module scope, so warm
+# invocations reuse it along with yfinance's cookie/crumb. Yahoo's throttling and gateway errors are retried
+# on the pooled connection rather than failing the factor outright
+YF_SESSION = requests.Session()
+YF_SESSION.mount('https://', HTTPAdapter(
+    pool_maxsize=FETCH_MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+# days re-fetched before a factor's latest stored return: gives the first new return its prior close across
+# weekends/holidays and rewrites a latest bar that was stored while its session was still open
+REFETCH_DAYS = 7
+
+# statements used by the staging/merge path
+_LAST_DATES_SQL = "SELECT factor_id, MAX(date) FROM factor.returns GROUP BY factor_id"
+_STAGING_TABLE_SQL = "CREATE TEMP TABLE staged_returns (LIKE factor.returns) ON COMMIT DROP"
+_ASYNC_COMMIT_SQL = "SET LOCAL synchronous_commit = off"
+_COPY_SQL = "COPY staged_returns (factor_id, date, return_value) FROM STDIN WITH CSV"
+# yfinance occasionally repeats the latest bar; keep one row per (factor_id, date) for the primary key
+_UPSERT_SQL = """
+    INSERT INTO factor.returns (factor_id, date, return_value)
+    SELECT DISTINCT ON (factor_id, date) factor_id, date, return_value
+    FROM staged_returns
+    ORDER BY factor_id, date
+    ON CONFLICT (factor_id, date) DO UPDATE SET return_value = EXCLUDED.return_value
+"""
+# the table holds the lookback window only, as it did when each run reloaded it in full
+_PRUNE_SQL = "DELETE FROM factor.returns WHERE date < %s"
+
+# connection kept at module scope so warm invocations (e.g. the event retries) skip the connect/TLS/auth handshake
+_connection = None
+
+# helper function to get a database connection, reusing the previous invocation's if it is still alive
 def get_db_connection():
-    return psycopg2.connect(
+    global _connection
+    if _connection is not None and not _connection.closed:
+        try:
+            # clear anything a failed previous run left open, then make sure the server is still there
+            _connection.rollback()
+            with _connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            _connection.rollback()
+            return _connection
+        except psycopg2.Error:
+            _connection.close()
+    _connection = psycopg2.connect(
         host=os.environ['DB_HOST'],
         database=os.environ['DB_NAME'],
         user=os.environ['DB_USER'],
         password=os.environ['DB_PASSWORD']
     )
+    return _connection
 
 def clean_market_data(df):
-    # Calculate returns from Close prices
-    returns = df['Close'].pct_change().dropna()
-    returns.index = returns.index.date
-    returns = returns.reset_index()
-    # The column is already named 'Date' from yfinance, and we're working with the 'Close' returns
-    returns.columns = ['date', 'return_value']
-    return returns
+    # Calculate returns from Close prices directly on the underlying arrays
+    closes = df['Close'].to_numpy(dtype=np.float64)
+    returns = closes[1:] / closes[:-1] - 1.0
+    # yfinance indexes by exchange-local timestamps; the trading date is the local calendar date
+    index = df.index if df.index.tz is None else df.index.tz_localize(None)
+    dates = index.values[1:].astype('datetime64[D]')
+    # drop returns that touch a missing or zero close (NaN or inf)
+    valid = np.isfinite(returns)
+    return dates[valid], returns[valid]
 
 # helper function to fetch market data for a symbol between two dates
 def fetch_market_data(symbol, start_date, end_date):
     # fetch the market data from yfinance
-    ticker = yf.Ticker(symbol)
+    ticker = yf.Ticker(symbol, session=YF_SESSION)
     df = ticker.history(start=start_date, end=end_date)
-    return df
+    # only the closes are used; keep just that column so the pending downloads don't hold full OHLCV frames
+    return df[['Close']]
 
 # helper function to get the list of factor_ids from the database
 def get_factors(cursor):
     # get the list of factor_ids from the database
     cursor.execute("SELECT factor_id FROM factor.factors")
-    return [row[0] for row in cursor.fetchall()]
+    return [factor_id for (factor_id,) in cursor]
+
+# helper function to get each factor's latest stored return date, so only the newer window is fetched
+def get_last_dates(cursor):
+    cursor.execute(_LAST_DATES_SQL)
+    return dict(cursor)
 
-# helper function to upload returns to the database
-def upload_to_database(factor_id: str, returns: pd.DataFrame, conn, cursor):
-    # Ensure we have the correct data structure
-    data = [(factor_id, row['date'], row['return_value']) for _, row in returns.iterrows()]
+# helper function to pick where a factor's download starts: the full lookback for a new factor, otherwise
+# a few days before its latest stored return
+def fetch_start(last_date, start_date):
+    if last_date is None:
+        return start_date
+    return max(start_date, last_date - timedelta(days=REFETCH_DAYS))
+
+# helper function to create the session-local table each factor's returns are staged in before the merge
+def create_staging_table(cursor):
+    cursor.execute(_STAGING_TABLE_SQL)
+    # the returns are re-fetchable, so this transaction's commit needn't wait on the WAL flush; SET LOCAL
+    # keeps it from leaking onto the reused connection
+    cursor.execute(_ASYNC_COMMIT_SQL)
+
+# helper function to stage returns for a factor (merged into factor.returns by merge_staged_returns)
+def upload_to_database(factor_id: str, returns: tuple[np.ndarray, np.ndarray], cursor):
+    # Ensure we have the correct data structure: one CSV line per (factor_id, date, return_value)
+    dates, values = returns
+    buffer = io.StringIO()
+    buffer.writelines(f"{factor_id},{date},{value!r}\n" for date, value in zip(dates.astype(str).tolist(), values.tolist()))
+    buffer.seek(0)
     
-    # insert the data into the database
-    cursor.executemany(
-        "INSERT INTO factor.returns (factor_id, date, return_value) VALUES (%s, %s, %s)", 
-        data
-    )
-    conn.commit()
+    # stream the rows in with COPY, which skips per-statement parsing and planning entirely
+    cursor.copy_expert(_COPY_SQL, buffer)
 
-# helper function to clear all existing return data for a factor_id
-def clear_returns(factor_id: str, conn, cursor):
-    cursor.execute(f"DELETE FROM factor.returns WHERE factor_id = '{factor_id}'")
-    conn.commit()
+# helper function to upsert the staged returns and drop those older than the lookback (committed by the caller)
+def merge_staged_returns(cursor, start_date):
+    cursor.execute(_UPSERT_SQL)
+    rows = cursor.rowcount
+    cursor.execute(_PRUNE_SQL, (start_date,))
+    return rows
 
 def handler(event, context):
     """Lambda handler function"""
 
     # set the date range
     LOOKBACK_YEARS = 2
-    end_date = datetime.now()
+    # whole days, computed once for every download; the end is exclusive, so tomorrow keeps today's bar
+    end_date = date.today() + timedelta(days=1)
     start_date = end_date - timedelta(days=365 * LOOKBACK_YEARS)
 
     # get a database connection
@@ -77,6 +153,7 @@ def handler(event, context):
     print(f'[ INFO ] Fetching factor_ids from database')
     try:
         factors = get_factors(cursor)
+        last_dates = get_last_dates(cursor)
     except Exception as e:
         print(f'[ ERROR ] Error fetching factor_ids from database: {e}')
         return {
@@ -84,33 +161,64 @@ def handler(event, context):
             'body': f'Error: {str(e)}'
         }
     
+    # every factor is staged first and merged in with one transaction at the end,
+    # so readers never see a partially applied update
+    try:
+        create_staging_table(cursor)
+    except Exception as e:
+        print(f'[ ERROR ] Error creating staging table: {e}')
+        return {
+            'statusCode': 500,
+            'body': f'Error: {str(e)}'
+        }
+
     success = 0
 
-    # for each factor_id, fetch the market data and insert it into the database
+    # start every factor's download up front; the database work below stays sequential on the one connection
+    executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS)
+    downloads = {
+        factor_id: executor.submit(fetch_market_data, factor_id, fetch_start(last_dates.get(factor_id), start_date), end_date)
+        for factor_id in factors
+    }
+    executor.shutdown(wait=False)
+
+    # for each factor_id, take its market data and insert it into the database
     for factor_id in factors:
         try:
             print(f'[ INFO ] Processing factor_id: {factor_id}')
-            # fetch the market data
-            returns = fetch_market_data(factor_id, start_date, end_date)
+            # wait for the market data
+            returns = downloads.pop(factor_id).result()
             print(f'[ INFO ] Fetched market data for {factor_id}')
             # clean the market data
             returns = clean_market_data(returns)
             print(f'[ INFO ] Cleaned market data for {factor_id}')
-            # clear the existing returns for the factor_id
-            clear_returns(factor_id, conn, cursor)
-            print(f'[ INFO ] Cleared existing returns for {factor_id}')
-            # upload the returns to the database
-            upload_to_database(factor_id, returns, conn, cursor)
-            print(f'[ INFO ] Uploaded returns for {factor_id}')
-            # delete the returns dataframe
-            del returns
-            gc.collect()
+            # stage the returns; a savepoint lets one failed COPY be undone without losing the other factors
+            cursor.execute("SAVEPOINT factor_upload")
+            upload_to_database(factor_id, returns, cursor)
+            cursor.execute("RELEASE SAVEPOINT factor_upload")
+            print(f'[ INFO ] Staged returns for {factor_id}')
             success += 1
         except Exception as e:
             print(f'[ ERROR ] Error processing factor_id: {factor_id}: {e}')
+            # discard this factor's partial rows so the transaction can carry on with the next factor
+            if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                cursor.execute("ROLLBACK TO SAVEPOINT factor_upload")
             continue
 
-    print(f'[ INFO ] Successfully processed {success} factor_ids')
+    # apply every staged factor's returns in one transaction
+    print(f'[ INFO ] Merging staged returns')
+    try:
+        rows = merge_staged_returns(cursor, start_date)
+        conn.commit()
+    except Exception as e:
+        print(f'[ ERROR ] Error merging staged returns: {e}')
+        conn.rollback()
+        return {
+            'statusCode': 500,
+            'body': f'Error: {str(e)}'
+        }
+
+    print(f'[ INFO ] Successfully processed {success} factor_ids ({rows} returns)')
     
     return {
         'statusCode': 200,